@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     name = 'api'
     verbose_name = 'Интерфейс прикладного программирования'
+
+    def ready(self):
+        from . import signals  # noqa: F401
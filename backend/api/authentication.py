@@ -0,0 +1,46 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import default_cache_is_shared
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+
+
+def token_cache_key(key):
+    """Ключ кэша для токена; сам токен в ключ не попадает."""
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def token_cache_enabled():
+    return settings.AUTH_TOKEN_CACHE_TIMEOUT > 0 and default_cache_is_shared()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, хранящий пользователя токена в кэше.
+
+    Запись удаляется при удалении токена (выход через djoser) и при
+    сохранении пользователя: смена пароля, блокировка и т.п.
+    Удаление должно дойти до всех воркеров, поэтому с кэшем в памяти
+    процесса (LocMem) или при AUTH_TOKEN_CACHE_TIMEOUT = 0 токен
+    каждый раз проверяется по базе.
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache_enabled():
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        user = cache.get(cache_key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, self.get_model()(key=key, user=user)
@@ -0,0 +1,142 @@
+"""Поколения (версии) данных для инвалидации кэшей и кэш в памяти."""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from recipes.models import ShoppingCart
+
+GENERATION_KEY = 'generation:{}'
+
+
+def default_cache_is_shared():
+    """Видят ли записи кэша по умолчанию все процессы приложения.
+
+    LocMem хранит данные в памяти воркера: удаление ключа в одном
+    процессе не затрагивает остальные.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _initial_generation():
+    """Начальное значение поколения.
+
+    Берётся от времени, чтобы после вытеснения ключа из кэша
+    поколение не совпало с одним из прежних.
+    """
+    return int(time.time() * 1000)
+
+
+def get_generation(name):
+    """Возвращает текущее поколение данных name."""
+    key = GENERATION_KEY.format(name)
+    generation = cache.get(key)
+    if generation is not None:
+        return generation
+    generation = _initial_generation()
+    if cache.add(key, generation, timeout=None):
+        return generation
+    return cache.get(key, generation)
+
+
+def get_generations(names):
+    """Поколения данных names одним обращением к кэшу."""
+    keys = [GENERATION_KEY.format(name) for name in names]
+    stored = cache.get_many(keys)
+    return [
+        stored[key] if key in stored else get_generation(name)
+        for name, key in zip(names, keys)
+    ]
+
+
+def bump_generation(*names):
+    """Сдвигает поколения данных, делая устаревшими связанные кэши.
+
+    Возвращает новые поколения {имя: значение}. incr атомарен и в LocMem,
+    и в Memcached: одновременные сдвиги из разных процессов не сливаются
+    в один, и каждый получает своё значение.
+    """
+    generations = {}
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            generations[name] = cache.incr(key)
+        except ValueError:
+            generations[name] = _initial_generation()
+            cache.set(key, generations[name], timeout=None)
+    return generations
+
+
+def cart_generation(user_id):
+    """Имя поколения списка покупок пользователя."""
+    return f'cart:{user_id}'
+
+
+def bump_recipe_carts(recipe_id):
+    """Сдвигает поколения списков покупок, содержащих рецепт."""
+    bump_generation(*(
+        cart_generation(user_id)
+        for user_id in ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+    ))
+
+
+class MemoryLRUCache:
+    """Кэш байтовых документов в памяти процесса.
+
+    Значение хранится вместе с версией: запись с другой версией
+    считается промахом. Общий размер ограничен max_bytes, при
+    переполнении вытесняются давно не использованные записи,
+    записи старше timeout секунд считаются устаревшими.
+    """
+
+    def __init__(self, max_bytes, timeout):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, expires, content = entry
+            if entry_version != version or expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return content
+
+    def set(self, key, version, content):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (
+                version, time.monotonic() + self.timeout, content
+            )
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def cache_stream(self, key, version, chunks):
+        """Отдаёт части документа и сохраняет его целиком в конце."""
+        parts = []
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size <= self.max_bytes:
+                parts.append(chunk)
+            yield chunk
+        if size <= self.max_bytes:
+            self.set(key, version, b''.join(parts))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[2])
@@ -1,6 +1,19 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import (Case, Exists, F, FloatField, Func, OuterRef,
+                              TextField, Value, When)
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+
+from .search import recipe_index
+
+# Конфигурация полнотекстового поиска берётся из базы (миграция
+# recipes 0006), как и у триггеров, заполняющих search_vector.
+SEARCH_CONFIG = Func(
+    function='recipes_search_config', output_field=TextField()
+)
 
 
 class IngredientFilter(filters.FilterSet):
@@ -19,12 +32,17 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтр для рецептов с поддержкой тегов, избранного и списка покупок."""
+    """Фильтр для рецептов с поддержкой тегов, избранного и списка покупок.
+
+    Все фильтры по связанным таблицам — полусоединения EXISTS,
+    поэтому строки рецептов не дублируются и DISTINCT не нужен.
+    """
 
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
         label='Фильтр по тегам (slug)',
         help_text='Можно выбрать несколько тегов'
     )
@@ -41,22 +59,70 @@ class RecipeFilter(filters.FilterSet):
         help_text='Показать только рецепты в списке покупок'
     )
 
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Поиск',
+        help_text='Поиск по названию, описанию и ингредиентам'
+    )
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
 
+    def filter_tags(self, queryset, name, value):
+        """Фильтрация рецептов, у которых есть хотя бы один из тегов."""
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=value
+            )
+        ))
+
     def filter_favorited(self, queryset, name, value):
         """Фильтрация рецептов в избранном."""
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                in_favorites__user=self.request.user
-            ).distinct()
-        return queryset.distinct()
+            return queryset.filter(Exists(
+                Favorite.objects.filter(
+                    user=self.request.user, recipe=OuterRef('pk')
+                )
+            ))
+        return queryset
 
     def filter_shopping_cart(self, queryset, name, value):
         """Фильтрация рецептов в списке покупок."""
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                in_shopping_carts__user=self.request.user
-            ).distinct()
-        return queryset.distinct()
+            return queryset.filter(Exists(
+                ShoppingCart.objects.filter(
+                    user=self.request.user, recipe=OuterRef('pk')
+                )
+            ))
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности."""
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by('-search_rank', '-created', '-id')
+
+        ranked = sorted(
+            recipe_index.search(value).items(),
+            key=lambda item: item[1],
+            reverse=True
+        )[:settings.RECIPE_SEARCH_FALLBACK_LIMIT]
+        return queryset.filter(
+            pk__in=[recipe_id for recipe_id, _ in ranked]
+        ).annotate(
+            search_rank=Case(
+                *(
+                    When(pk=recipe_id, then=Value(score))
+                    for recipe_id, score in ranked
+                ),
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        ).order_by('-search_rank', '-created', '-id')
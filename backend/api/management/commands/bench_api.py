@@ -0,0 +1,191 @@
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag, User
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[round(percent / 100 * (len(ordered) - 1))]
+
+
+class Command(BaseCommand):
+    """Замер горячих путей API внутри процесса.
+
+    Каждый сценарий выполняется через тестовый клиент: сначала прогрев,
+    затем серия запросов с замером времени и числа SQL-запросов,
+    затем несколько запросов под tracemalloc: пик выделенной памяти
+    относительно начала запроса.
+    """
+
+    help = 'Замер p50/p95, SQL-запросов и выделений памяти для API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество замеряемых запросов на сценарий'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Количество запросов прогрева'
+        )
+        parser.add_argument(
+            '--alloc-requests', type=int, default=5,
+            help='Количество запросов под tracemalloc'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--only',
+            help='Сценарии через запятую (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Метка прогона, например хэш коммита'
+        )
+        parser.add_argument(
+            '--json',
+            help='Файл для результатов в формате JSON'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = self._scenarios()
+        if options['only']:
+            names = options['only'].split(',')
+            unknown = set(names) - {name for name, *_ in scenarios}
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+                )
+            scenarios = [item for item in scenarios if item[0] in names]
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, client, urls in scenarios:
+                results[name] = self._run(client, urls, options)
+                self.stdout.write(
+                    '{:<22} p50 {p50_ms:>8.2f} мс  p95 {p95_ms:>8.2f} мс  '
+                    '{queries:>5.1f} запросов  '
+                    'пик {peak_alloc_kb:>8.1f} КБ'.format(
+                        name, **results[name]
+                    )
+                )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    {
+                        'label': options['label'],
+                        'cold': options['cold'],
+                        'requests': options['requests'],
+                        'scenarios': results,
+                    },
+                    file, ensure_ascii=False, indent=2
+                )
+
+    def _scenarios(self):
+        user = User.objects.annotate(
+            follows=Count('subscriptions', distinct=True),
+            cart=Count('shopping_carts', distinct=True),
+        ).filter(cart__gt=0).order_by('-follows').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if user is None or recipe is None:
+            raise CommandError(
+                'Нет данных, сначала выполните generate_data'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        anonymous = APIClient()
+        authenticated = APIClient()
+        authenticated.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        tags = '&'.join(
+            f'tags={slug}'
+            for slug in Tag.objects.values_list('slug', flat=True)[:2]
+        )
+        prefixes = sorted({
+            name[:2].lower()
+            for name in Ingredient.objects.values_list('name', flat=True)[:50]
+        })
+        deep_page = max(1, min(
+            50, Recipe.objects.count() // settings.PAGINATION_PAGE_SIZE
+        ))
+        return [
+            ('feed_anonymous', anonymous, ['/api/recipes/']),
+            ('feed_anonymous_tags', anonymous, [f'/api/recipes/?{tags}']),
+            ('feed_anonymous_deep', anonymous,
+             [f'/api/recipes/?page={deep_page}']),
+            ('feed_authenticated', authenticated, ['/api/recipes/']),
+            ('feed_favorited', authenticated,
+             [f'/api/recipes/?is_favorited=1&{tags}']),
+            ('feed_shopping_cart', authenticated,
+             ['/api/recipes/?is_in_shopping_cart=1']),
+            ('recipe_detail', authenticated, [f'/api/recipes/{recipe.id}/']),
+            ('subscriptions', authenticated,
+             ['/api/users/subscriptions/?recipes_limit=3']),
+            ('ingredient_search', anonymous, [
+                f'/api/ingredients/?name={prefix}' for prefix in prefixes
+            ]),
+            ('shopping_list_txt', authenticated,
+             ['/api/recipes/download_shopping_cart/?format=txt']),
+            ('shopping_list_pdf', authenticated,
+             ['/api/recipes/download_shopping_cart/?format=pdf']),
+        ]
+
+    def _request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+    def _run(self, client, urls, options):
+        cold = options['cold']
+        for number in range(options['warmup']):
+            self._request(client, urls[number % len(urls)], cold)
+
+        timings = []
+        queries = 0
+        for number in range(options['requests']):
+            url = urls[number % len(urls)]
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                self._request(client, url, cold)
+                timings.append(time.perf_counter() - started)
+            queries += len(context)
+
+        allocated = []
+        tracemalloc.start()
+        try:
+            for number in range(options['alloc_requests']):
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                self._request(client, urls[number % len(urls)], cold)
+                _, peak = tracemalloc.get_traced_memory()
+                allocated.append(peak - before)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'queries': round(queries / len(timings), 2),
+            'peak_alloc_kb': round(
+                sum(allocated) / len(allocated) / 1024 if allocated else 0.0,
+                1
+            ),
+        }
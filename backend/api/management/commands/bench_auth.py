@@ -0,0 +1,63 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import (CachedTokenAuthentication, token_cache_enabled,
+                                token_cache_key)
+
+
+class Command(BaseCommand):
+    """Сравнение аутентификации по токену с кэшем и без него."""
+
+    help = 'Замер запросов к базе и времени аутентификации по токену'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Количество аутентифицируемых запросов'
+        )
+
+    def handle(self, *args, **options):
+        token = Token.objects.filter(user__is_active=True).first()
+        if token is None:
+            self.stdout.write(self.style.ERROR('Нет токенов в базе'))
+            return
+        if not token_cache_enabled():
+            self.stdout.write(self.style.WARNING(
+                'Кэш токенов отключён: нужен общий для процессов кэш '
+                'и AUTH_TOKEN_CACHE_TIMEOUT > 0'
+            ))
+        total = options['requests']
+        factory = APIRequestFactory()
+        cache.delete(token_cache_key(token.key))
+
+        for title, authentication in (
+            ('TokenAuthentication', TokenAuthentication()),
+            ('CachedTokenAuthentication', CachedTokenAuthentication()),
+        ):
+            requests = [
+                Request(factory.get(
+                    '/api/users/me/',
+                    HTTP_AUTHORIZATION=f'Token {token.key}'
+                ))
+                for _ in range(total)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for request in requests:
+                    authentication.authenticate(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{title}: {len(queries) / total:.3f} запросов к базе '
+                f'и {elapsed / total * 1e6:.1f} мкс на запрос'
+            )
+        cache.delete(token_cache_key(token.key))
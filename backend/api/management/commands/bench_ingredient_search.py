@@ -0,0 +1,61 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.filters import IngredientFilter
+from api.search import ingredient_index
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Сравнение поиска ингредиентов через ORM и через индекс в памяти."""
+
+    help = 'Замер времени автодополнения ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Количество поисковых запросов'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора случайных запросов'
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stdout.write(self.style.ERROR('Нет ингредиентов в базе'))
+            return
+        rng = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['queries']):
+            name = rng.choice(names)
+            start = rng.randrange(len(name))
+            queries.append(name[start:start + rng.randint(1, 4)])
+
+        ingredient_index.search('')
+        for title, search in (
+            ('ORM (icontains)', self._search_orm),
+            ('Индекс в памяти', ingredient_index.search),
+        ):
+            started = time.perf_counter()
+            for query in queries:
+                search(query)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{title}: {elapsed / len(queries) * 1e6:.1f} мкс/запрос'
+            )
+
+    @staticmethod
+    def _search_orm(query):
+        queryset = IngredientFilter(
+            {'name': query}, queryset=Ingredient.objects.all()
+        ).qs
+        return IngredientSerializer(queryset, many=True).data
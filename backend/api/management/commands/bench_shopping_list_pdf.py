@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from api.utils import FONT_NAME, FONT_PATH, generate_shopping_list_pdf
+
+
+class Command(BaseCommand):
+    """Замер процессорного времени генерации PDF списка покупок."""
+
+    help = 'Замер времени генерации PDF списка покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10,100,1000',
+            help='Количество строк списка покупок через запятую'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов для каждого размера'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        repeat = options['repeat']
+        generate_shopping_list_pdf([])
+
+        for size in sizes:
+            rows = [
+                {
+                    'ingredient__name': f'Ингредиент {number}',
+                    'ingredient__measurement_unit': 'г',
+                    'sum': number,
+                }
+                for number in range(size)
+            ]
+            before = self._measure(rows, repeat, self._legacy_setup)
+            after = self._measure(rows, repeat)
+            self.stdout.write(
+                f'{size} строк: до {before * 1000:.1f} мс, '
+                f'после {after * 1000:.1f} мс'
+            )
+
+    @staticmethod
+    def _legacy_setup():
+        """Повторяет работу, которую раньше делал каждый запрос."""
+        pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
+        getSampleStyleSheet()
+
+    @staticmethod
+    def _measure(rows, repeat, setup=None):
+        started = time.process_time()
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            generate_shopping_list_pdf(rows)
+        return (time.process_time() - started) / repeat
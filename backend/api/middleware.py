@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceededError(Exception):
+    """Маршрут выполнил больше SQL-запросов, чем разрешено бюджетом."""
+
+
+class RouteStats:
+    """Накопленная статистика запросов по маршрутам текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route, queries, db_time, app_time, size):
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_ms': 0.0,
+                'app_ms': 0.0,
+                'bytes': 0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['db_ms'] += db_time * 1000
+            stats['app_ms'] += app_time * 1000
+            stats['bytes'] += size
+
+    def snapshot(self):
+        """Средние значения по маршрутам, самые затратные — первыми."""
+        with self._lock:
+            routes = [
+                (route, dict(stats)) for route, stats in self._routes.items()
+            ]
+        result = []
+        for route, stats in routes:
+            requests = stats['requests']
+            result.append({
+                'route': route,
+                'requests': requests,
+                'avg_queries': round(stats['queries'] / requests, 2),
+                'max_queries': stats['max_queries'],
+                'avg_db_ms': round(stats['db_ms'] / requests, 2),
+                'avg_app_ms': round(stats['app_ms'] / requests, 2),
+                'avg_bytes': stats['bytes'] // requests,
+                'total_ms': round(stats['db_ms'] + stats['app_ms'], 2),
+            })
+        result.sort(key=lambda item: item['total_ms'], reverse=True)
+        return {'pid': os.getpid(), 'routes': result}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы и время в базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+# Счётчик текущего запроса. Контекстные переменные передаются
+# в потоки sync_to_async, поэтому под ASGI запросы синхронных
+# представлений попадают в счётчик своего запроса.
+current_counter = ContextVar('query_counter', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Обёртка соединения, передающая запрос счётчику текущего запроса."""
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class QueryStatsMiddleware:
+    """Считает SQL-запросы, время в базе и в Python, размер ответа.
+
+    Время в Python (app) — всё, кроме базы: представления,
+    сериализаторы и рендеринг. Результат добавляется в заголовок
+    Server-Timing и в route_stats. Если маршрут из QUERY_BUDGETS
+    превысил бюджет запросов, это пишется в лог или, при
+    QUERY_BUDGET_MODE = 'raise', приводит к ошибке.
+
+    Работает и в синхронной, и в асинхронной цепочке обработчиков.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        # Соединение могло открыться до загрузки middleware.
+        install_query_counter(None, connection)
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        return self.process(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        return self.process(request, response, counter, started)
+
+    def process(self, request, response, counter, started):
+        total = time.perf_counter() - started
+        app_time = max(total - counter.duration, 0.0)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        route = f'{request.method} {view_name}'
+        if response.streaming:
+            size = int(response.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+        route_stats.add(route, counter.count, counter.duration, app_time, size)
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={counter.duration * 1000:.1f};'
+                f'desc="{counter.count} queries", '
+                f'app;dur={app_time * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        budget = settings.QUERY_BUDGETS.get(route)
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{route}: {counter.count} SQL-запросов '
+                f'при бюджете {budget}'
+            )
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceededError(message)
+            logger.warning(message)
+        return response
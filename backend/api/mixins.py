@@ -0,0 +1,169 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from .cache import get_generation, get_generations
+from .relations import UserRelations, get_relations
+
+
+class CachedCatalogMixin:
+    """Кэширует готовый JSON списка справочника и отдаёт его с ETag.
+
+    Кэш версионируется поколением cache_generation, поэтому
+    сбрасывается при любом изменении справочника.
+    """
+
+    cache_generation = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        key = 'catalog:{}:{}'.format(
+            self.cache_generation, get_generation(self.cache_generation)
+        )
+        cached = cache.get(key)
+        if cached is None:
+            serializer = self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True
+            )
+            content = request.accepted_renderer.render(
+                serializer.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            cached = (content, etag)
+            cache.set(key, cached, settings.CATALOG_CACHE_TIMEOUT)
+
+        content, etag = cached
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                content, content_type=request.accepted_media_type
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class SharedResponseCacheMixin:
+    """Кэширует готовые ответы list и retrieve, общие для всех пользователей.
+
+    Ключ — схема, хост, путь и отсортированные параметры запроса:
+    в ответе есть абсолютные ссылки. В кэше лежит ответ для анонимного
+    пользователя, а признаки текущего пользователя накладываются на него
+    методом personalize_shared_data. Вместе с ответом хранятся поколения
+    shared_cache_generations: если они изменились или истёк срок
+    свежести, ответ пересчитывает один запрос под блокировкой, а
+    остальные тем временем получают устаревшую копию. Если копии нет,
+    остальные считают ответ сами, не дожидаясь блокировки: ожидание
+    заняло бы синхронный воркер.
+    """
+
+    shared_cache_generations = ()
+    shared_cache_lock_timeout = 10
+
+    def list(self, request, *args, **kwargs):
+        return self.shared_cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.shared_cached(super().retrieve, request, *args, **kwargs)
+
+    def can_share_response(self, request):
+        return True
+
+    def personalize_shared_data(self, data, relations):
+        return data
+
+    def get_shared_cache_key(self, request):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        return 'response:{}'.format(hashlib.md5(repr((
+            request.scheme, request.get_host(), request.path, params
+        )).encode()).hexdigest())
+
+    def shared_cached(self, handler, request, *args, **kwargs):
+        if (
+            request.accepted_renderer.format != 'json'
+            or not self.can_share_response(request)
+        ):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_shared_cache_key(request)
+        generations = self._generations()
+        cached = cache.get(key)
+        if cached is not None:
+            *_, status_code, content = cached
+            if self._is_fresh(cached, generations):
+                return self._shared_response(content, status_code, 'HIT')
+
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, self.shared_cache_lock_timeout):
+            if cached is not None:
+                return self._shared_response(content, status_code, 'STALE')
+            return handler(request, *args, **kwargs)
+
+        try:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                self.personalize_shared_data(
+                    response.data, UserRelations(AnonymousUser())
+                ),
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            cache.set(
+                key,
+                (
+                    generations,
+                    time.time() + settings.SHARED_CACHE_FRESH_TIMEOUT,
+                    response.status_code,
+                    content
+                ),
+                settings.SHARED_CACHE_TIMEOUT
+            )
+        finally:
+            cache.delete(lock_key)
+        return self._shared_response(content, response.status_code, 'MISS')
+
+    def _generations(self):
+        return get_generations(self.shared_cache_generations)
+
+    @staticmethod
+    def _is_fresh(cached, generations):
+        cached_generations, fresh_until, *_ = cached
+        return cached_generations == generations and fresh_until > time.time()
+
+    def _shared_response(self, content, status_code, state):
+        request = self.request
+        if request.user.is_authenticated:
+            content = request.accepted_renderer.render(
+                self.personalize_shared_data(
+                    json.loads(content), get_relations(request)
+                ),
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+        response = HttpResponse(
+            content,
+            status=status_code,
+            content_type=request.accepted_media_type
+        )
+        response['X-Cache'] = state
+        patch_vary_headers(response, ('Authorization',))
+        return response
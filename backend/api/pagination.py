@@ -1,10 +1,276 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
+                                       PageNumberPagination, _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.conf import settings
 
+from .cache import get_generations
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_queryset(queryset):
+    """COUNT(*) или, для больших выборок, оценка планировщика."""
+    threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+    if (
+        threshold is not None
+        and hasattr(queryset, 'query')
+        and connections[queryset.db].vendor == 'postgresql'
+    ):
+        estimate = estimate_count(queryset)
+        if estimate >= threshold:
+            return estimate
+    if hasattr(queryset, 'count'):
+        return queryset.count()
+    return len(queryset)
+
+
+class CachedCountMixin:
+    """Кэширует общее количество объектов для пагинаторов.
+
+    Ключ строится из пути, параметров фильтрации и поколений,
+    которые возвращает view.get_count_generations(). Если view
+    такого метода не имеет, количество не кэшируется.
+    """
+
+    count_ignored_params = ('page', 'limit', 'offset', 'cursor', 'format')
+
+    def get_cached_count(self, queryset, request, view):
+        get_names = getattr(view, 'get_count_generations', None)
+        if get_names is None:
+            return count_queryset(queryset)
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in self.count_ignored_params
+            for value in values
+        )
+        names = get_names()
+        generations = list(zip(names, get_generations(names)))
+        key = 'count:{}'.format(hashlib.md5(
+            repr((request.path, params, generations)).encode()
+        ).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = count_queryset(queryset)
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CountedPaginator(Paginator):
+    """Paginator, получающий количество объектов от функции count_func."""
 
-class CustomPagination(PageNumberPagination):
+    def __init__(self, object_list, per_page, count_func, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+
+class CustomPagination(CachedCountMixin, PageNumberPagination):
     """Пагинатор с поддержкой ?limit=N (макс. 100)."""
 
     page_size_query_param = 'limit'
     max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
     page_size = settings.PAGINATION_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountedPaginator(
+            object_list,
+            per_page,
+            lambda queryset: self.get_cached_count(
+                queryset, self.request, self.view
+            )
+        )
+
+
+class CustomLimitOffsetPagination(CachedCountMixin, LimitOffsetPagination):
+    """Пагинатор ?limit=N&offset=M с кэшированием количества."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        return self.get_cached_count(queryset, self.request, self.view)
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (created, id) без OFFSET и COUNT(*).
+
+    Курсор — непрозрачная строка с ключом граничного рецепта
+    и направлением перехода. Стоимость страницы не зависит от её
+    номера, но общего количества в ответе нет.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    page_size = settings.PAGINATION_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by('-created', '-id')
+        else:
+            # Условие created <= курсора (>= при переходе назад)
+            # ограничивает диапазон индекса recipe_created_idx, OR
+            # в PostgreSQL применяется только как фильтр строк.
+            created, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created__gt=created) | Q(created=created, id__gt=pk),
+                    created__gte=created
+                ).order_by('created', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created__lt=created) | Q(created=created, id__lt=pk),
+                    created__lte=created
+                ).order_by('-created', '-id')
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, recipe, reverse):
+        token = urlsafe_b64encode(json.dumps(
+            [recipe.created.isoformat(), recipe.pk, reverse]
+        ).encode()).decode()
+        return replace_query_param(
+            remove_query_param(self.base_url, 'page'),
+            self.cursor_query_param,
+            token
+        )
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            created, pk, reverse = json.loads(urlsafe_b64decode(token))
+            return datetime.fromisoformat(created), int(pk), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class FeedPagination(KeysetPagination):
+    """Пагинация ленты по ключу (created, id) только вперёд.
+
+    Страницу собирает функция get_page(cursor, limit), которой
+    передаётся ключ последнего рецепта предыдущей страницы.
+    """
+
+    def paginate_feed(self, get_page, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            created, pk, reverse = cursor
+            if reverse:
+                raise NotFound(self.invalid_cursor_message)
+            cursor = (created, pk)
+
+        results = get_page(cursor, page_size + 1)
+        self.has_next = len(results) > page_size
+        self.has_previous = False
+        self.page = results[:page_size]
+        return self.page
+
+
+class RecipePagination(CustomPagination):
+    """Номерная пагинация рецептов с режимом курсора по запросу.
+
+    Если в запросе есть ?cursor= (пустое значение — первая страница),
+    используется KeysetPagination, иначе прежний ответ с count.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
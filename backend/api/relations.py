@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Favorite, Follow, ShoppingCart
+
+RELATIONS_KEY = 'relations:{}:{}'
+
+# Модель связи: имя множества и поле с id связанного объекта.
+RELATIONS = {
+    Favorite: ('favorites', 'recipe_id'),
+    ShoppingCart: ('shopping_cart', 'recipe_id'),
+    Follow: ('follows', 'author_id'),
+}
+
+
+class UserRelations:
+    """Множества id избранного, списка покупок и подписок пользователя.
+
+    Каждое множество читается из общего кэша при первом обращении,
+    а при промахе загружается из базы одним запросом.
+    """
+
+    def __init__(self, user):
+        self.user_id = user.id
+        self._sets = {}
+
+    def get(self, model):
+        name, field = RELATIONS[model]
+        if name not in self._sets:
+            self._sets[name] = self._load(model, name, field)
+        return self._sets[name]
+
+    def _load(self, model, name, field):
+        if self.user_id is None:
+            return frozenset()
+        key = RELATIONS_KEY.format(name, self.user_id)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(model.objects.filter(
+                user_id=self.user_id
+            ).values_list(field, flat=True))
+            cache.set(key, ids, settings.RELATIONS_CACHE_TIMEOUT)
+        return ids
+
+    @property
+    def favorites(self):
+        return self.get(Favorite)
+
+    @property
+    def shopping_cart(self):
+        return self.get(ShoppingCart)
+
+    @property
+    def follows(self):
+        return self.get(Follow)
+
+
+def get_relations(request):
+    """Связи текущего пользователя, загружаемые один раз за запрос."""
+    relations = getattr(request, '_user_relations', None)
+    if relations is None or relations.user_id != request.user.id:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
+
+
+def update_relation(user_id, model, object_id, present):
+    """Добавляет id в закэшированное множество или удаляет из него.
+
+    Если множества нет в кэше, оно загрузится из базы при следующем
+    чтении. Параллельные изменения одного пользователя могут потерять
+    обновление, поэтому срок хранения ограничен.
+    """
+    name, _ = RELATIONS[model]
+    key = RELATIONS_KEY.format(name, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        return
+    if present:
+        ids = ids | {object_id}
+    else:
+        ids = ids - {object_id}
+    cache.set(key, ids, settings.RELATIONS_CACHE_TIMEOUT)
@@ -0,0 +1,114 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .utils import generate_shopping_list_pdf
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Строки списка — словари с ключами ingredient__name,
+    ingredient__measurement_unit и sum. Метод stream отдаёт документ
+    частями, что позволяет передавать его через StreamingHttpResponse.
+    Рендереры с offload = True выполняются в пуле рендеринга.
+    """
+
+    offload = False
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if isinstance(data, dict) or (
+            response is not None and response.exception
+        ):
+            # Ошибки и служебные ответы отдаются в JSON.
+            response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(data)
+        return b''.join(self.stream(data))
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    offload = True
+
+    def stream(self, rows):
+        yield generate_shopping_list_pdf(rows).getvalue()
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок\n\n'.encode(self.charset)
+        for item in rows:
+            yield (
+                f'{item["ingredient__name"]} '
+                f'({item["ingredient__measurement_unit"]}) — {item["sum"]}\n'
+            ).encode(self.charset)
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        ).encode(self.charset)
+        for item in rows:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['sum'],
+            )).encode(self.charset)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def stream(self, rows):
+        separator = b'['
+        for item in rows:
+            yield separator + json.dumps({
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['sum'],
+            }, ensure_ascii=False).encode()
+            separator = b','
+        yield b']' if separator == b',' else b'[]'
+
+
+def render_document(renderer, rows):
+    """Рендерит документ целиком; пригодно для запуска в пуле."""
+    return renderer.format, renderer.content_type, renderer.render(rows)
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListPDFRenderer,
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+)
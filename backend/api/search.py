@@ -0,0 +1,290 @@
+"""Поиск ингредиентов и рецептов в памяти процесса."""
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+from .cache import bump_generation, get_generation, get_generations
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре."""
+    return WORD_RE.findall(text.casefold())
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов для автодополнения.
+
+    Строится лениво при первом запросе и перестраивается,
+    когда меняется поколение 'ingredients'. Сначала возвращаются
+    совпадения по началу названия, затем по вхождению.
+    """
+
+    generation_name = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = ([], [])
+
+    def _build(self):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        self._entries = ([row['name'].casefold() for row in rows], rows)
+
+    def _ensure_fresh(self):
+        generation = get_generation(self.generation_name)
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation != self._generation:
+                self._build()
+                self._generation = generation
+
+    def search(self, query, limit=None):
+        """Возвращает ингредиенты, подходящие под query."""
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        self._ensure_fresh()
+        keys, rows = self._entries
+        query = query.strip().casefold()
+
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = rows[start:min(end, start + limit)]
+        if len(result) == limit:
+            return result
+
+        for position, key in enumerate(keys):
+            if start <= position < end or query not in key:
+                continue
+            result.append(rows[position])
+            if len(result) == limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
+
+
+class RecipeIndex:
+    """Обратный индекс рецептов для поиска без PostgreSQL.
+
+    Повторяет веса поискового вектора: название, ингредиенты,
+    описание. Слово запроса совпадает со словами, которые с него
+    начинаются, — так частично заменяется морфология. Индекс
+    перестраивается целиком при смене поколений рецептов
+    или ингредиентов, поэтому годится для разработки и тестов.
+    """
+
+    generation_names = ('recipes', 'ingredients')
+    weights = {'name': 1.0, 'ingredients': 0.4, 'text': 0.2}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = ([], {})
+
+    def _build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        for recipe_id, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).iterator():
+            for word in tokenize(name):
+                postings[word][recipe_id] += self.weights['name']
+            for word in tokenize(text):
+                postings[word][recipe_id] += self.weights['text']
+        for recipe_id, name in IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            for word in tokenize(name):
+                postings[word][recipe_id] += self.weights['ingredients']
+        self._entries = (sorted(postings), postings)
+
+    def _ensure_fresh(self):
+        generation = get_generations(self.generation_names)
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation != self._generation:
+                self._build()
+                self._generation = generation
+
+    def search(self, query):
+        """Возвращает {id рецепта: релевантность} для рецептов,
+        в которых нашлись все слова запроса."""
+        self._ensure_fresh()
+        words, postings = self._entries
+        scores = None
+        for term in tokenize(query):
+            matched = defaultdict(float)
+            position = bisect_left(words, term)
+            while (
+                position < len(words) and words[position].startswith(term)
+            ):
+                for recipe_id, weight in postings[words[position]].items():
+                    matched[recipe_id] += weight
+                position += 1
+            if scores is None:
+                scores = matched
+            else:
+                scores = {
+                    recipe_id: score + matched[recipe_id]
+                    for recipe_id, score in scores.items()
+                    if recipe_id in matched
+                }
+            if not scores:
+                break
+        return dict(scores or {})
+
+
+recipe_index = RecipeIndex()
+
+
+def popcount(mask):
+    """Число установленных битов (int.bit_count появился в Python 3.10)."""
+    return bin(mask).count('1')
+
+
+class CookableIndex:
+    """Индекс «рецепт -> множество ингредиентов» для подбора рецептов
+    по имеющимся продуктам.
+
+    Множество ингредиентов рецепта хранится битовой маской по
+    Ingredient.id, а для отбора кандидатов есть обратный индекс
+    «ингредиент -> рецепты». Изменения состава в своём процессе
+    применяются точечно; если поколение изменил другой процесс,
+    индекс перестраивается целиком при следующем поиске.
+    """
+
+    generation_name = 'recipe_ingredients'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._generation = None
+        self._masks = {}
+        self._postings = defaultdict(set)
+        self._dirty = set()
+
+    def _build(self):
+        masks = defaultdict(int)
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            masks[recipe_id] |= 1 << ingredient_id
+        self._masks = {}
+        self._postings = defaultdict(set)
+        self._dirty = set()
+        for recipe_id, mask in masks.items():
+            self._set(recipe_id, mask)
+
+    def _set(self, recipe_id, mask):
+        old_mask, _ = self._masks.pop(recipe_id, (0, 0))
+        for ingredient_id in self._bits(old_mask & ~mask):
+            self._postings[ingredient_id].discard(recipe_id)
+        for ingredient_id in self._bits(mask & ~old_mask):
+            self._postings[ingredient_id].add(recipe_id)
+        if mask:
+            self._masks[recipe_id] = (mask, popcount(mask))
+
+    @staticmethod
+    def _bits(mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def _reload_dirty(self):
+        masks = dict.fromkeys(self._dirty, 0)
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id__in=self._dirty
+        ).values_list('recipe_id', 'ingredient_id'):
+            masks[recipe_id] |= 1 << ingredient_id
+        for recipe_id, mask in masks.items():
+            self._set(recipe_id, mask)
+        self._dirty = set()
+
+    def _change(self, apply):
+        """Сдвигает поколение и применяет изменение, если индекс
+        процесса до этого был актуален.
+
+        Индекс актуален, только если сдвиг дал следующее за его
+        поколением значение: иначе поколение менял и другой процесс,
+        и индекс перестроится при следующем поиске.
+        """
+        with self._lock:
+            generation = bump_generation(
+                self.generation_name
+            )[self.generation_name]
+            if (
+                self._generation is not None
+                and generation == self._generation + 1
+            ):
+                apply()
+                self._generation = generation
+
+    def update(self, recipe_id, ingredient_ids):
+        """Задаёт состав рецепта после его сохранения."""
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            mask |= 1 << ingredient_id
+
+        def apply():
+            self._dirty.discard(recipe_id)
+            self._set(recipe_id, mask)
+        self._change(apply)
+
+    def invalidate(self, recipe_id):
+        """Помечает состав рецепта для перечитывания из базы."""
+        self._change(lambda: self._dirty.add(recipe_id))
+
+    def _ensure_fresh(self):
+        generation = get_generation(self.generation_name)
+        with self._lock:
+            if generation != self._generation:
+                self._build()
+                self._generation = generation
+            elif self._dirty:
+                self._reload_dirty()
+
+    def search(self, ingredient_ids, limit):
+        """Лучшие limit рецептов по доле имеющихся ингредиентов.
+
+        Возвращает список (id рецепта, совпало, не хватает).
+        """
+        self._ensure_fresh()
+        with self._lock:
+            have = 0
+            candidates = set()
+            for ingredient_id in set(ingredient_ids):
+                recipe_ids = self._postings.get(ingredient_id)
+                if recipe_ids:
+                    have |= 1 << ingredient_id
+                    candidates.update(recipe_ids)
+            scored = []
+            for recipe_id in candidates:
+                mask, size = self._masks[recipe_id]
+                matched = popcount(mask & have)
+                scored.append((recipe_id, matched, size - matched, size))
+        return [
+            (recipe_id, matched, missing)
+            for recipe_id, matched, missing, _ in heapq.nsmallest(
+                limit,
+                scored,
+                key=lambda item: (-item[1] / item[3], item[2], -item[0])
+            )
+        ]
+
+
+cookable_index = CookableIndex()
@@ -4,15 +4,16 @@ from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
 from recipes.models import (
-    Favorite,
     Follow,
     Ingredient,
     IngredientInRecipe,
     Recipe,
-    ShoppingCart,
     Tag,
     User,
 )
+from .cache import bump_generation, bump_recipe_carts
+from .relations import get_relations
+from .search import cookable_index
 
 
 class TagSerializer(ModelSerializer):
@@ -49,11 +50,18 @@ class UserSerializer(UserCreateSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_relations(request).follows
 
     def get_avatar(self, obj):
-        """Возвращает URL аватара или None, если аватар отсутствует."""
-        return obj.avatar.url if obj.avatar else None
+        """Возвращает URL аватара (в списках — миниатюры)
+        или None, если аватар отсутствует."""
+        avatar = (
+            obj.avatar_preview if self.context.get('thumbnails')
+            else obj.avatar
+        )
+        return avatar.url if avatar else None
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
@@ -96,7 +104,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Короткий сериализатор для рецептов (в избранном, подписках и т.д.)."""
 
-    image = Base64ImageField()
+    image = serializers.ImageField(source='image_preview', read_only=True)
 
     class Meta:
         model = Recipe
@@ -114,6 +122,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -123,23 +132,32 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name', 'image', 'text', 'cooking_time'
         )
 
+    def get_image(self, obj):
+        """Полное изображение, а в списках — миниатюра."""
+        image = (
+            obj.image_preview if self.context.get('thumbnails')
+            else obj.image
+        )
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное."""
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return Favorite.objects.filter(
-            user=request.user, recipe=obj
-        ).exists()
+        return obj.id in get_relations(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, добавлен ли рецепт в список покупок."""
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return ShoppingCart.objects.filter(
-            user=request.user, recipe=obj
-        ).exists()
+        return obj.id in get_relations(request).shopping_cart
 
 
 class CreateIngredientsInRecipeSerializer(serializers.ModelSerializer):
@@ -256,6 +274,11 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         IngredientInRecipe.objects.filter(recipe=recipe).delete()
         self._add_ingredients(ingredients_data, recipe)
         recipe.tags.set(tags)
+        cookable_index.update(
+            recipe.id, [item['id'] for item in ingredients_data]
+        )
+        bump_recipe_carts(recipe.id)
+        bump_generation('recipes')
 
     def create(self, validated_data):
         """Создаёт рецепт."""
@@ -322,10 +345,12 @@ class FollowRepresentationSerializer(UserSerializer):
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = obj.recipes.all()
-        limit = request.query_params.get('recipes_limit')
-        if limit and limit.isdigit():
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = request.query_params.get('recipes_limit')
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
 
         return RecipeShortSerializer(
             recipes,
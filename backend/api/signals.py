@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            ShoppingCart, Tag, User)
+from recipes.signals import recipe_ingredients_changed
+
+from .authentication import token_cache_key
+from .cache import bump_generation, bump_recipe_carts, cart_generation
+from .search import cookable_index
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    """Сбрасывает кэши ингредиентов при их изменении."""
+    bump_generation('ingredients')
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, **kwargs):
+    """Ингредиент удаляется из всех рецептов каскадом."""
+    bump_generation('recipe_ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Сбрасывает кэши тегов при их изменении."""
+    bump_generation('tags')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш списка покупок пользователя."""
+    bump_generation(cart_generation(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    """Сбрасывает кэши выборок рецептов."""
+    bump_generation('recipes')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Убирает удалённый рецепт из индекса подбора по продуктам."""
+    cookable_index.invalidate(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    """Сбрасывает кэши, зависящие от избранного пользователя."""
+    bump_generation(f'favorites:{instance.user_id}')
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follows_changed(sender, instance, **kwargs):
+    """Сбрасывает кэши, зависящие от подписок пользователя."""
+    bump_generation(f'follows:{instance.user_id}')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, created, update_fields=None, **kwargs):
+    """Сбрасывает кэши списка пользователей и данных авторов."""
+    if created:
+        bump_generation('users')
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_generation('authors')
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    """Сбрасывает кэши списка пользователей и данных авторов."""
+    bump_generation('users', 'authors')
+
+
+@receiver(recipe_ingredients_changed)
+def recipes_ingredients_changed(sender, recipe_ids, **kwargs):
+    """Сбрасывает кэши рецептов и списков покупок, в которых они есть.
+
+    Приёмник сигналов IngredientInRecipe срабатывал бы на каждую
+    строку и отключал бы быстрое удаление строк.
+    """
+    for recipe_id in recipe_ids:
+        bump_recipe_carts(recipe_id)
+        cookable_index.invalidate(recipe_id)
+    bump_generation('recipes')
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Сбрасывает кэш аутентификации при выходе."""
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_auth_changed(sender, instance, created, update_fields=None,
+                      **kwargs):
+    """Сбрасывает кэш аутентификации при смене пароля, блокировке
+    и других изменениях пользователя."""
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    cache.delete_many([
+        token_cache_key(key)
+        for key in Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True)
+    ])
@@ -0,0 +1,962 @@
+import base64
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F
+from django.http import HttpResponse
+from django.test import (AsyncClient, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_INTRANS)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from foodgram.postgresql.pool import ConnectionPool, PoolTimeoutError
+from recipes import feed
+from recipes.models import (Favorite, Follow, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag, User)
+
+from .authentication import CachedTokenAuthentication
+from .cache import bump_generation
+from .middleware import QueryBudgetExceededError, QueryStatsMiddleware
+from .pagination import count_queryset
+from .search import cookable_index
+from .utils import generate_shopping_list_pdf, get_pdf_styles
+from .workers import RenderPool, RenderPoolBusyError
+
+TAGS_URL = '/api/tags/'
+INGREDIENTS_URL = '/api/ingredients/'
+RECIPES_URL = '/api/recipes/'
+COOKABLE_URL = '/api/recipes/cookable/'
+FEED_URL = '/api/recipes/feed/'
+SHOPPING_LIST_URL = '/api/recipes/download_shopping_cart/'
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHE_ROOT = tempfile.mkdtemp()
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_ROOT,
+}
+
+
+def image_data():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+    return 'data:image/png;base64,{}'.format(
+        base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password-123'
+    )
+
+
+class RecipeTestData:
+    """Авторы, теги, ингредиенты и рецепты для тестов рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(1)
+        cls.user = create_user(2)
+        cls.breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.dinner = Tag.objects.create(name='Ужин', slug='dinner')
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'яйца')
+        ]
+        cls.recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(
+                (cls.breakfast, cls.dinner) if number % 2
+                else (cls.breakfast,)
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in ingredients
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[:6]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeQueryCountTest(RecipeTestData, TestCase):
+    """Число запросов к базе на страницу рецептов не зависит от её размера.
+
+    Кэши очищаются перед каждым запросом, поэтому считается
+    холодный путь: выборка, подсчёт и подгрузка связанных объектов.
+    """
+
+    def flag_queries(self, limit):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(RECIPES_URL, {'limit': limit})
+        self.assertEqual(len(response.json()['results']), limit)
+        return sum(
+            'recipes_favorite' in query['sql']
+            or 'recipes_shoppingcart' in query['sql']
+            for query in context.captured_queries
+        )
+
+    def test_list_flags(self):
+        self.assertEqual(
+            len({self.flag_queries(limit) for limit in (1, 6, 12)}), 1
+        )
+
+    def assert_page_queries(self, client, number):
+        for limit in (1, 6, 12):
+            cache.clear()
+            with self.assertNumQueries(number):
+                response = client.get(RECIPES_URL, {'limit': limit})
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_list_anonymous(self):
+        self.assert_page_queries(self.anonymous, 4)
+
+    def test_list_authenticated(self):
+        self.assert_page_queries(self.client, 7)
+
+    def test_retrieve_anonymous(self):
+        with self.assertNumQueries(3):
+            response = self.anonymous.get(
+                f'{RECIPES_URL}{self.recipes[0].id}/'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_favorited'])
+
+    def test_retrieve_authenticated(self):
+        recipe = self.recipes[0]
+        with self.assertNumQueries(6):
+            response = self.client.get(f'{RECIPES_URL}{recipe.id}/')
+        self.assertTrue(response.json()['is_favorited'])
+        self.assertTrue(response.json()['is_in_shopping_cart'])
+        self.assertTrue(response.json()['author']['is_subscribed'])
+
+
+class SubscriptionRecipesTest(RecipeTestData, TestCase):
+    """Последние рецепты авторов в списке подписок."""
+
+    def test_recipes_limit_with_equal_dates(self):
+        other = create_user(3)
+        Follow.objects.create(user=self.user, author=other)
+        Recipe.objects.create(
+            author=other, name='Другой', text='Описание', cooking_time=5
+        )
+        Recipe.objects.filter(author=self.author).update(
+            created=self.recipes[0].created
+        )
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}
+        )
+        recipes = {
+            author['id']: [recipe['id'] for recipe in author['recipes']]
+            for author in response.json()['results']
+        }
+        self.assertEqual(
+            recipes[self.author.id],
+            [recipe.id for recipe in reversed(self.recipes[-3:])]
+        )
+        self.assertEqual(len(recipes[other.id]), 1)
+
+
+class RecipeFilterTest(RecipeTestData, TestCase):
+    """Фильтры рецептов — полусоединения EXISTS без DISTINCT."""
+
+    def get_ids(self, client, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(RECIPES_URL, dict(params, limit=100))
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+        # Условия отбора — после FROM: флаги в списке полей тоже EXISTS.
+        page_query = next(
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "recipes_recipe"."id"')
+        ).partition(' FROM "recipes_recipe"')[2]
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        return page_query, ids
+
+    def ids(self, recipes):
+        return sorted(recipe.id for recipe in recipes)
+
+    def test_without_filters(self):
+        page_query, ids = self.get_ids(self.anonymous, {})
+        self.assertNotIn('EXISTS', page_query)
+        self.assertEqual(sorted(ids), self.ids(self.recipes))
+
+    def test_tags(self):
+        page_query, ids = self.get_ids(
+            self.anonymous, {'tags': ['breakfast', 'dinner']}
+        )
+        self.assertIn('EXISTS', page_query)
+        self.assertEqual(sorted(ids), self.ids(self.recipes))
+
+        page_query, ids = self.get_ids(self.anonymous, {'tags': 'dinner'})
+        self.assertIn('EXISTS', page_query)
+        self.assertEqual(sorted(ids), self.ids(self.recipes[1::2]))
+
+    def test_favorites_cart_and_tags(self):
+        page_query, ids = self.get_ids(self.client, {
+            'is_favorited': 1, 'is_in_shopping_cart': 1, 'tags': 'dinner'
+        })
+        self.assertEqual(page_query.count('EXISTS'), 3)
+        self.assertEqual(sorted(ids), self.ids(self.recipes[1:6:2]))
+
+    def test_false_flags_and_anonymous(self):
+        for client, params in (
+            (self.client, {'is_favorited': 0}),
+            (self.anonymous, {'is_favorited': 1, 'is_in_shopping_cart': 1}),
+        ):
+            with self.subTest(params=params):
+                page_query, ids = self.get_ids(client, params)
+                self.assertNotIn('EXISTS', page_query)
+                self.assertEqual(sorted(ids), self.ids(self.recipes))
+
+
+class SharedResponseCacheTest(RecipeTestData, TestCase):
+    """Общий кэш ответов не выдаёт чужие выборки."""
+
+    def get_ids(self, client, params):
+        response = client.get(RECIPES_URL, dict(params, limit=100))
+        return sorted(recipe['id'] for recipe in response.json()['results'])
+
+    def test_personal_filters_are_not_shared(self):
+        favorites = sorted(recipe.id for recipe in self.recipes[:6])
+        everything = sorted(recipe.id for recipe in self.recipes)
+        other = APIClient()
+        other.force_authenticate(create_user(3))
+        for params in (
+            {'is_favorited': 'TRUE'},
+            {'is_favorited': 'true'},
+            {'is_in_shopping_cart': 'True'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.get_ids(self.client, params), favorites)
+                self.assertEqual(
+                    self.get_ids(self.anonymous, params), everything
+                )
+                self.assertEqual(self.get_ids(other, params), [])
+
+    def test_hit_and_invalidation_on_edit(self):
+        url = f'{RECIPES_URL}{self.recipes[0].id}/'
+        self.assertEqual(self.anonymous.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        self.recipes[0].name = 'Новое название'
+        self.recipes[0].save()
+        response = self.anonymous.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_absolute_urls_follow_host(self):
+        for host in ('a.example.com', 'b.example.com', 'a.example.com'):
+            with self.subTest(host=host):
+                response = self.anonymous.get(
+                    RECIPES_URL, {'limit': 1}, HTTP_HOST=host
+                )
+                self.assertTrue(response.json()['next'].startswith(
+                    f'http://{host}/'
+                ))
+
+    def test_cold_key_under_lock_renders_at_once(self):
+        with mock.patch.object(cache, 'add', return_value=False):
+            started = time.monotonic()
+            response = self.anonymous.get(RECIPES_URL)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(response.json()['results']), 6)
+
+
+class CatalogCacheTest(TestCase):
+    """Готовый JSON справочника отдаётся с ETag и ответом 304."""
+
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def test_not_modified(self):
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_change_resets_etag(self):
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.create(name='Ужин', slug='dinner')
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            [tag['slug'] for tag in response.json()],
+            ['breakfast', 'dinner']
+        )
+
+
+class IngredientSearchTest(TestCase):
+    """Автодополнение ингредиентов: сначала совпадения по началу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('морская соль', 'соль', 'сахар', 'Солод'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, name):
+        response = self.client.get(INGREDIENTS_URL, {'name': name})
+        return [row['name'] for row in response.json()]
+
+    def test_prefix_first(self):
+        self.assertEqual(
+            self.search('Со'), ['Солод', 'соль', 'морская соль']
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search('сах'), ['сахар'])
+
+    def test_follows_changes(self):
+        self.search('со')
+        Ingredient.objects.create(name='сода', measurement_unit='г')
+        self.assertEqual(
+            self.search('со'), ['сода', 'Солод', 'соль', 'морская соль']
+        )
+
+
+class RecipeSearchTest(RecipeTestData, TestCase):
+    """Полнотекстовый поиск рецептов."""
+
+    def test_search_by_name_and_ingredient(self):
+        pancakes = Recipe.objects.create(
+            author=self.author, name='Блины', text='Тонкие', cooking_time=20
+        )
+        IngredientInRecipe.objects.create(
+            recipe=pancakes,
+            ingredient=Ingredient.objects.create(
+                name='творог', measurement_unit='г'
+            ),
+            amount=200
+        )
+        for query in ('блины', 'творог'):
+            with self.subTest(query=query):
+                response = self.anonymous.get(RECIPES_URL, {'search': query})
+                self.assertEqual(
+                    [recipe['id'] for recipe in response.json()['results']],
+                    [pancakes.id]
+                )
+
+
+class PaginationCountTest(RecipeTestData, TestCase):
+    """Количество в ответе кэшируется до изменения данных."""
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(RECIPES_URL, {'is_favorited': 1})
+        return response.json()['count'], sum(
+            'COUNT(' in query['sql'].upper()
+            for query in context.captured_queries
+        )
+
+    def test_cached_until_change(self):
+        self.assertEqual(self.count_queries(), (6, 1))
+        self.assertEqual(self.count_queries(), (6, 0))
+        Favorite.objects.create(user=self.user, recipe=self.recipes[6])
+        self.assertEqual(self.count_queries(), (7, 1))
+
+    @skipUnless(
+        connection.vendor == 'postgresql',
+        'оценка берётся из плана PostgreSQL'
+    )
+    def test_estimate(self):
+        with self.settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1):
+            with CaptureQueriesContext(connection) as context:
+                self.assertGreaterEqual(
+                    count_queryset(Recipe.objects.all()), 1
+                )
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('EXPLAIN', context.captured_queries[0]['sql'])
+        with self.settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=None):
+            self.assertEqual(count_queryset(Recipe.objects.all()), 12)
+
+
+class KeysetPaginationTest(RecipeTestData, TestCase):
+    """Постраничный обход рецептов по курсору."""
+
+    def setUp(self):
+        super().setUp()
+        # Половина рецептов с одинаковой датой: порядок задаёт id.
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in self.recipes[3:9]]
+        ).update(created=self.recipes[3].created)
+
+    def get_page(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.anonymous.get(url).json()
+        return data, [query['sql'] for query in queries]
+
+    def test_walk_forward_and_back(self):
+        expected = list(Recipe.objects.order_by(
+            '-created', '-id'
+        ).values_list('id', flat=True))
+        pages = []
+        data, _ = self.get_page(f'{RECIPES_URL}?cursor=&limit=5')
+        while True:
+            pages.append([recipe['id'] for recipe in data['results']])
+            if not data['next']:
+                break
+            data, queries = self.get_page(data['next'])
+            self.assertTrue(any(
+                '"recipes_recipe"."created" <=' in sql for sql in queries
+            ))
+        self.assertEqual(sum(pages, []), expected)
+
+        for page in reversed(pages[:-1]):
+            data, queries = self.get_page(data['previous'])
+            self.assertEqual(
+                [recipe['id'] for recipe in data['results']], page
+            )
+            self.assertTrue(any(
+                '"recipes_recipe"."created" >=' in sql for sql in queries
+            ))
+
+
+class FeedTest(RecipeTestData, TestCase):
+    """Лента подписок: порядок, курсор и число запросов."""
+
+    def setUp(self):
+        super().setUp()
+        created = self.recipes[0].created
+        Recipe.objects.filter(author=self.author).update(created=created)
+        for number in range(3, 6):
+            author = create_user(number)
+            Follow.objects.create(user=self.user, author=author)
+            for _ in range(3):
+                Recipe.objects.create(
+                    author=author, name='Рецепт', text='Описание',
+                    cooking_time=5
+                )
+        # Рецепты разных авторов с одной датой: порядок задаёт id.
+        others = Recipe.objects.exclude(author=self.author).order_by('id')
+        Recipe.objects.filter(
+            pk__in=list(others.values_list('pk', flat=True))[::2]
+        ).update(created=created)
+
+    def walk(self):
+        ids, queries = [], []
+        url = f'{FEED_URL}?limit=4'
+        while url:
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                data = self.client.get(url).json()
+            ids += [recipe['id'] for recipe in data['results']]
+            queries.append(len(captured))
+            url = data['next']
+        return ids, queries
+
+    def expected(self):
+        return list(Recipe.objects.filter(
+            author__followers__user=self.user
+        ).order_by('-created', '-id').values_list('id', flat=True))
+
+    def test_merged_feed(self):
+        ids, _ = self.walk()
+        self.assertEqual(ids, self.expected())
+
+    @skipUnless(
+        connection.features.supports_slicing_ordering_in_compound,
+        'Срезы авторов читаются по одному'
+    )
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_merged_feed_queries(self):
+        _, queries = self.walk()
+        self.assertEqual(len(set(queries)), 1)
+
+        Follow.objects.filter(user=self.user).exclude(
+            author=self.author
+        ).delete()
+        _, single_author_queries = self.walk()
+        self.assertEqual(set(single_author_queries), set(queries))
+
+    def test_inbox_feed(self):
+        with self.settings(FEED_INBOX_MIN_FOLLOWS=1):
+            feed.rebuild(self.user.id)
+            ids, _ = self.walk()
+        self.assertEqual(ids, self.expected())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeUpdateTest(RecipeTestData, TestCase):
+    """Изменение состава рецепта."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def update_recipe(self, recipe, amount):
+        author = APIClient()
+        author.force_authenticate(self.author)
+        return author.patch(f'{RECIPES_URL}{recipe.id}/', {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient in Ingredient.objects.all()[:2]
+            ],
+            'tags': [self.dinner.id],
+            'image': image_data(),
+            'name': 'Новое название',
+            'text': 'Новое описание',
+            'cooking_time': 5,
+        }, format='json')
+
+    def test_update_queries(self):
+        with self.assertNumQueries(21):
+            response = self.update_recipe(self.recipes[0], 5)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_serves_thumbnail(self):
+        recipe = self.recipes[0]
+        self.update_recipe(recipe, 5)
+        recipe.refresh_from_db()
+        detail = self.anonymous.get(f'{RECIPES_URL}{recipe.id}/').json()
+        listed = next(
+            item for item in self.anonymous.get(
+                RECIPES_URL, {'limit': 12}
+            ).json()['results']
+            if item['id'] == recipe.id
+        )
+        self.assertTrue(detail['image'].endswith(recipe.image.url))
+        self.assertTrue(
+            listed['image'].endswith(recipe.image_thumbnail.url)
+        )
+
+    def get_shopping_list(self):
+        response = self.client.get(SHOPPING_LIST_URL, {'format': 'json'})
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_shopping_list_follows_recipe_changes(self):
+        before = self.get_shopping_list()
+        self.assertEqual(self.get_shopping_list(), before)
+        self.update_recipe(self.recipes[0], 1000)
+        self.assertNotEqual(self.get_shopping_list(), before)
+
+    def test_shopping_list_follows_admin_move(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='password'
+        )
+        self.client.force_login(admin)
+        row = IngredientInRecipe.objects.filter(
+            recipe=self.recipes[0]
+        ).first()
+        IngredientInRecipe.objects.filter(
+            recipe=self.recipes[7], ingredient_id=row.ingredient_id
+        ).delete()
+        before = self.get_shopping_list()
+        # Строку переносят в рецепт, которого нет в списке покупок.
+        response = self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.id}/change/', {
+                'recipe': self.recipes[7].id,
+                'ingredient': row.ingredient_id,
+                'amount': row.amount,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(self.get_shopping_list(), before)
+
+
+class CookableTest(RecipeTestData, TestCase):
+    """Подбор рецептов по имеющимся продуктам."""
+
+    def get_cookable(self, ingredients, limit=5):
+        response = self.anonymous.get(COOKABLE_URL, {
+            'ingredients': ','.join(str(pk) for pk in ingredients),
+            'limit': limit,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ingredient_ids(self):
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def test_deleted_recipe_disappears(self):
+        results = self.get_cookable(self.ingredient_ids())
+        self.assertEqual(results[0]['id'], self.recipes[-1].id)
+        self.recipes[-1].delete()
+        results = self.get_cookable(self.ingredient_ids())
+        self.assertEqual(len(results), 5)
+        self.assertNotIn(
+            self.recipes[-1].id, [recipe['id'] for recipe in results]
+        )
+
+    def test_deleted_ingredient_leaves_recipes(self):
+        flour, *others = Ingredient.objects.order_by('id')
+        self.assertEqual(self.get_cookable([flour.id])[0]['missing'], 2)
+        others[0].delete()
+        self.assertEqual(self.get_cookable([flour.id])[0]['missing'], 1)
+
+    def test_concurrent_change_rebuilds_index(self):
+        self.get_cookable(self.ingredient_ids())
+        changed = self.recipes[-2]
+
+        def bump_with_concurrent_change(*names):
+            try:
+                return bump_generation(*names)
+            finally:
+                # Другой процесс меняет состав рецепта сразу после сдвига.
+                IngredientInRecipe.objects.filter(recipe=changed).delete()
+                bump_generation(*names)
+
+        with mock.patch(
+            'api.search.bump_generation', bump_with_concurrent_change
+        ):
+            cookable_index.invalidate(self.recipes[-1].id)
+        results = self.get_cookable(self.ingredient_ids(), limit=100)
+        self.assertNotIn(changed.id, [recipe['id'] for recipe in results])
+
+
+class ShoppingListExportTest(RecipeTestData, TestCase):
+    """Список покупок выгружается в pdf, txt, csv и json."""
+
+    def download(self, **kwargs):
+        response = self.client.get(SHOPPING_LIST_URL, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response['Content-Type'], content
+
+    def test_formats(self):
+        content_type, content = self.download(data={'format': 'json'})
+        self.assertEqual(content_type, 'application/json')
+        self.assertEqual(json.loads(content), [
+            {'name': name, 'measurement_unit': 'г', 'amount': 600}
+            for name in ('мука', 'сахар', 'яйца')
+        ])
+
+        content_type, content = self.download(data={'format': 'csv'})
+        self.assertEqual(content_type, 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(
+            rows[0], ['Ингредиент', 'Единица измерения', 'Количество']
+        )
+        self.assertEqual(rows[1], ['мука', 'г', '600'])
+
+        content_type, content = self.download(data={'format': 'txt'})
+        self.assertEqual(content_type, 'text/plain; charset=utf-8')
+        self.assertIn('мука (г) — 600', content.decode())
+
+        content_type, content = self.download(data={'format': 'pdf'})
+        self.assertEqual(content_type, 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_negotiation(self):
+        content_type, _ = self.download(HTTP_ACCEPT='text/csv')
+        self.assertEqual(content_type, 'text/csv; charset=utf-8')
+        content_type, content = self.download()
+        self.assertEqual(content_type, 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+
+class BenchmarkCommandsTest(TestCase):
+    """Генерация синтетических данных и замер API на них."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for slug in ('breakfast', 'dinner'):
+            Tag.objects.create(name=slug, slug=slug)
+        for number in range(20):
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+
+    def test_generate_and_bench(self):
+        call_command(
+            'generate_data', users=20, recipes=30, seed=1,
+            stdout=io.StringIO()
+        )
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertFalse(User.objects.annotate(
+            actual=Count('recipes')
+        ).exclude(recipes_count=F('actual')).exists())
+
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as file:
+            call_command(
+                'bench_api', requests=2, warmup=0, alloc_requests=1,
+                only='feed_anonymous,recipe_detail,shopping_list_txt',
+                json=file.name, stdout=io.StringIO()
+            )
+            scenarios = json.load(file)['scenarios']
+        self.assertEqual(
+            set(scenarios),
+            {'feed_anonymous', 'recipe_detail', 'shopping_list_txt'}
+        )
+        for result in scenarios.values():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['queries'], 0)
+
+
+class ShoppingListPDFTest(SimpleTestCase):
+    """Шрифт и стили PDF создаются один раз на процесс."""
+
+    rows = [{
+        'ingredient__name': 'мука',
+        'ingredient__measurement_unit': 'г',
+        'sum': 100,
+    }]
+
+    def test_resources_are_reused(self):
+        generate_shopping_list_pdf(self.rows)
+        with mock.patch(
+            'api.utils.pdfmetrics.registerFont'
+        ) as register_font, mock.patch(
+            'api.utils.getSampleStyleSheet'
+        ) as get_styles:
+            content = generate_shopping_list_pdf(self.rows).getvalue()
+        register_font.assert_not_called()
+        get_styles.assert_not_called()
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIs(get_pdf_styles(), get_pdf_styles())
+
+
+class FakeConnection:
+    """Соединение psycopg2 с минимальным интерфейсом для пула."""
+
+    def __init__(self):
+        self.closed = 0
+        self.info = mock.Mock(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.rollback = mock.Mock()
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Выдача и возврат соединений пула."""
+
+    def test_reuse(self):
+        pool = ConnectionPool(max_size=1, timeout=1, max_age=None)
+        connection, created, reused = pool.get(FakeConnection)
+        self.assertFalse(reused)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.put(connection, created)
+        connection.rollback.assert_called_once()
+        self.assertEqual(pool.get(FakeConnection), (connection, created, True))
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot['open'], snapshot['reused']), (1, 1))
+
+    def test_timeout(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01, max_age=None)
+        pool.get(FakeConnection)
+        with self.assertRaises(PoolTimeoutError):
+            pool.get(FakeConnection)
+        self.assertEqual(pool.snapshot()['timeouts'], 1)
+
+    def test_obsolete_connection_is_closed(self):
+        pool = ConnectionPool(max_size=1, timeout=1, max_age=0)
+        connection, created, _ = pool.get(FakeConnection)
+        pool.put(connection, created)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.snapshot()['open'], 0)
+        self.assertIsNot(pool.get(FakeConnection)[0], connection)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01, max_age=None)
+        with self.assertRaises(OSError):
+            pool.get(mock.Mock(side_effect=OSError))
+        self.assertFalse(pool.get(FakeConnection)[2])
+
+
+class TokenCacheTest(TestCase):
+    """Кэш токенов не переживает отзыв токена."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.token = Token.objects.create(user=create_user(1))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_ROOT, ignore_errors=True)
+
+    def authenticate(self, number_of_queries):
+        request = Request(APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        ))
+        with self.assertNumQueries(number_of_queries):
+            user, _ = CachedTokenAuthentication().authenticate(request)
+        self.assertEqual(user, self.token.user)
+
+    def assert_revoked(self):
+        self.token.delete()
+        request = Request(APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        ))
+        with self.assertRaises(AuthenticationFailed):
+            CachedTokenAuthentication().authenticate(request)
+
+    def test_process_local_cache_is_not_used(self):
+        cache.clear()
+        self.authenticate(1)
+        self.authenticate(1)
+        self.assert_revoked()
+
+    @override_settings(CACHES={'default': SHARED_CACHE})
+    def test_shared_cache(self):
+        cache.clear()
+        self.authenticate(1)
+        self.authenticate(0)
+        self.assert_revoked()
+
+    @override_settings(
+        CACHES={'default': SHARED_CACHE},
+        AUTH_TOKEN_CACHE_TIMEOUT=0
+    )
+    def test_disabled(self):
+        self.authenticate(1)
+        self.authenticate(1)
+
+
+class QueryStatsMiddlewareTest(TestCase):
+    """Учёт запросов в синхронной и асинхронной цепочке."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_chain_mode(self):
+        async def async_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(
+            QueryStatsMiddleware(async_response)
+        ))
+        self.assertFalse(iscoroutinefunction(
+            QueryStatsMiddleware(lambda request: HttpResponse())
+        ))
+
+    def test_server_timing(self):
+        response = self.client.get(TAGS_URL)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    async def test_server_timing_async(self):
+        response = await AsyncClient().get(TAGS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(
+        QUERY_BUDGETS={'GET api:tags-list': 0}, QUERY_BUDGET_MODE='raise'
+    )
+    def test_budget(self):
+        with self.assertRaises(QueryBudgetExceededError):
+            self.client.get(TAGS_URL)
+
+
+class AsgiTest(RecipeTestData, TestCase):
+    """Под ASGI API отдаёт те же ответы, что и под WSGI."""
+
+    async def test_recipes_under_asgi(self):
+        client = AsyncClient()
+        for url in (RECIPES_URL, f'{RECIPES_URL}{self.recipes[0].pk}/'):
+            with self.subTest(url=url):
+                response = await client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response.content, self.anonymous.get(url).content
+                )
+
+
+class RenderPoolTest(SimpleTestCase):
+    """Ограниченный пул рендеринга и фоновые задачи."""
+
+    def setUp(self):
+        self.pool = RenderPool(
+            backend='thread', workers=1, max_pending=1, timeout=5
+        )
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def wait_done(self, job_id, owner_id):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            job = self.pool.get_job(job_id, owner_id)
+            if job[0]:
+                return job
+            time.sleep(0.01)
+        self.fail('Задача не завершилась')
+
+    def test_busy_pool_rejects_at_once(self):
+        self.pool.submit(self.release.wait)
+        started = time.monotonic()
+        with self.assertRaises(RenderPoolBusyError):
+            self.pool.submit(self.release.wait)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_job_is_visible_to_other_workers(self):
+        job_id = self.pool.start_job(1, self.release.wait)
+        other_worker = RenderPool(
+            backend='thread', workers=1, max_pending=1, timeout=5
+        )
+        self.assertEqual(other_worker.get_job(job_id, 1), (False, None))
+        self.assertIsNone(other_worker.get_job(job_id, 2))
+        self.release.set()
+        self.wait_done(job_id, 1)
+        self.assertEqual(other_worker.get_job(job_id, 1), (True, True))
+
+    def test_failed_callback_still_finishes_job(self):
+        def callback(result):
+            raise ValueError(result)
+
+        with self.assertLogs('api.workers', 'ERROR'):
+            job_id = self.pool.start_job(1, int, '5', callback=callback)
+            self.assertEqual(self.wait_done(job_id, 1), (True, 5))
+
+    def test_failed_job_is_logged(self):
+        with self.assertLogs('api.workers', 'ERROR'):
+            job_id = self.pool.start_job(1, int, 'не число')
+            self.assertEqual(self.wait_done(job_id, 1), (True, None))
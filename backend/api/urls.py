@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (DatabaseStatsView, IngredientViewSet, QueryStatsView,
+                    RecipeViewSet, TagViewSet, UserViewSet)
 
 router = routers.DefaultRouter()
 router.register(
@@ -27,6 +28,8 @@ router.register(
 app_name = 'api'
 
 urlpatterns = [
+    path('stats/queries/', QueryStatsView.as_view(), name='query-stats'),
+    path('stats/db/', DatabaseStatsView.as_view(), name='db-stats'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
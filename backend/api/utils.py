@@ -1,4 +1,6 @@
+from functools import lru_cache
 from io import BytesIO
+from pathlib import Path
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
@@ -9,24 +11,20 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import (Paragraph, SimpleDocTemplate, Spacer, Table,
                                 TableStyle)
 
+FONT_NAME = 'DejaVuLGCSans'
+FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'DejaVuLGCSans.ttf'
 
-def generate_shopping_list_pdf(recipes_in_shopping_list):
-    buffer = BytesIO()
 
-    pdfmetrics.registerFont(TTFont(
-        'DejaVuLGCSans',
-        './api/fonts/DejaVuLGCSans.ttf'
-    ))
+def register_font():
+    """Регистрирует шрифт в ReportLab, если он ещё не зарегистрирован."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
 
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        leftMargin=0.5 * inch,
-        rightMargin=0.5 * inch,
-        topMargin=0.5 * inch,
-        bottomMargin=0.5 * inch
-    )
 
+@lru_cache(maxsize=None)
+def get_pdf_styles():
+    """Стили заголовка и таблицы, создаются один раз на процесс."""
+    register_font()
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(
         name='TitleStyle',
@@ -34,13 +32,52 @@ def generate_shopping_list_pdf(recipes_in_shopping_list):
         leading=22,
         alignment=1,
         spaceAfter=20,
-        fontName='DejaVuLGCSans',
+        fontName=FONT_NAME,
         textColor=colors.darkgreen
     ))
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ])
+    return styles['TitleStyle'], table_style
+
+
+def add_background(canvas, doc):
+    canvas.saveState()
+    canvas.setFillColor(colors.lightblue)
+    canvas.rect(0, 0, letter[0], letter[1], fill=1, stroke=0)
+
+    canvas.setFillColor(colors.white)
+    canvas.rect(
+        0.5 * inch, 0.5 * inch,
+        letter[0] - inch, letter[1] - inch,
+        fill=1, stroke=0
+    )
+    canvas.restoreState()
+
+
+def generate_shopping_list_pdf(recipes_in_shopping_list):
+    buffer = BytesIO()
+    title_style, table_style = get_pdf_styles()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        leftMargin=0.5 * inch,
+        rightMargin=0.5 * inch,
+        topMargin=0.5 * inch,
+        bottomMargin=0.5 * inch
+    )
 
     story = []
 
-    story.append(Paragraph('Список покупок', styles['TitleStyle']))
+    story.append(Paragraph('Список покупок', title_style))
     story.append(Spacer(1, 0.2 * inch))
 
     data = [['Ингредиент', 'Количество']]
@@ -51,32 +88,10 @@ def generate_shopping_list_pdf(recipes_in_shopping_list):
         data.append([name, f'{amount} {unit}'])
 
     table = Table(data, colWidths=[4 * inch, 2 * inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgreen),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'DejaVuLGCSans'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
+    table.setStyle(table_style)
 
     story.append(table)
 
-    def add_background(canvas, doc):
-        canvas.saveState()
-        canvas.setFillColor(colors.lightblue)
-        canvas.rect(0, 0, letter[0], letter[1], fill=1, stroke=0)
-
-        canvas.setFillColor(colors.white)
-        canvas.rect(
-            0.5 * inch, 0.5 * inch,
-            letter[0] - inch, letter[1] - inch,
-            fill=1, stroke=0
-        )
-        canvas.restoreState()
-
     doc.build(story, onFirstPage=add_background, onLaterPages=add_background)
 
     buffer.seek(0)
@@ -1,25 +1,39 @@
-from django.db.models import Prefetch, Sum, Count
-from django.http import FileResponse
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import (BooleanField, Prefetch, Sum, Value,
+                              prefetch_related_objects)
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import response, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (
-    AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+    AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 )
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from recipes.feed import feed_page
 from recipes.models import (
     Favorite, Follow, Ingredient, IngredientInRecipe,
     Recipe, ShoppingCart, Tag, User
 )
+from .cache import cart_generation, get_generations, MemoryLRUCache
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .middleware import route_stats
+from .mixins import CachedCatalogMixin, SharedResponseCacheMixin
+from .pagination import (CustomLimitOffsetPagination, FeedPagination,
+                         RecipePagination)
 from .permissions import IsAuthorOrReadOnly
+from .relations import update_relation
+from .renderers import SHOPPING_LIST_RENDERERS, render_document
+from .search import cookable_index, ingredient_index
 from .serializers import (AddFavoritesSerializer, CreateRecipeSerializer,
                           FollowRepresentationSerializer,
                           FollowCreateSerializer,
@@ -27,21 +41,28 @@ from .serializers import (AddFavoritesSerializer, CreateRecipeSerializer,
                           RecipeSerializer, TagSerializer,
                           ToggleRelationSerializer,
                           UserAvatarSerializer, UserSerializer)
-from .utils import generate_shopping_list_pdf
+from .workers import RenderPoolBusyError, RenderTimeoutError, render_pool
+
+shopping_list_cache = MemoryLRUCache(
+    max_bytes=settings.SHOPPING_LIST_CACHE_MAX_BYTES,
+    timeout=settings.SHOPPING_LIST_CACHE_TIMEOUT
+)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с тегами."""
 
+    cache_generation = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с ингредиентами."""
 
+    cache_generation = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -50,6 +71,13 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        """Автодополнение по ?name= обслуживается индексом в памяти."""
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
 
 class UserViewSet(UserViewSet):
     """Вьюсет для работы с пользователями и подписками."""
@@ -57,7 +85,19 @@ class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = CustomLimitOffsetPagination
+
+    def get_serializer_context(self):
+        """В списке пользователей вместо аватаров отдаются миниатюры."""
+        context = super().get_serializer_context()
+        context['thumbnails'] = self.action == 'list'
+        return context
+
+    def get_count_generations(self):
+        """Поколения данных, от которых зависит количество в списке."""
+        if self.action == 'subscriptions':
+            return (f'follows:{self.request.user.id}',)
+        return ('users',)
 
     @action(
         detail=False,
@@ -79,16 +119,21 @@ class UserViewSet(UserViewSet):
         queryset = User.objects.filter(
             followers__user=request.user
         ).annotate(
-            recipes_count=Count('recipes')
-        ).prefetch_related(
-            Prefetch(
-                'recipes',
-                queryset=Recipe.objects.all()
-            )
-        ).distinct()
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.latest_per_author(
+                int(limit), [author.id for author in pages]
+            )
+        prefetch_related_objects(
+            pages,
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
         serializer = FollowRepresentationSerializer(
-            pages, many=True, context={'request': request}
+            pages, many=True, context={'request': request, 'thumbnails': True}
         )
         return self.get_paginated_response(serializer.data)
 
@@ -116,6 +161,7 @@ class UserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            update_relation(user.id, Follow, author.id, present=True)
             representation = FollowRepresentationSerializer(
                 author,
                 context={'request': request}
@@ -135,6 +181,7 @@ class UserViewSet(UserViewSet):
                     {'errors': 'Вы не подписаны на этого пользователя'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            update_relation(user.id, Follow, author.id, present=False)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -154,13 +201,10 @@ class UserViewSet(UserViewSet):
         serializer = UserAvatarSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        avatar_data = serializer.validated_data.get('avatar')
-        request.user.avatar = avatar_data
+        request.user.avatar = serializer.validated_data.get('avatar')
         request.user.save()
 
-        image_url = request.build_absolute_uri(
-            f'/media/users/{avatar_data.name}'
-        )
+        image_url = request.build_absolute_uri(request.user.avatar.url)
         return response.Response(
             {'avatar': str(image_url)}, status=status.HTTP_200_OK
         )
@@ -173,15 +217,59 @@ class UserViewSet(UserViewSet):
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(SharedResponseCacheMixin, ModelViewSet):
     """Вьюсет для работы с рецептами."""
 
+    shared_cache_generations = ('recipes', 'tags', 'ingredients', 'authors')
+
     queryset = Recipe.objects.all()
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """План запроса для списка и детального просмотра:
+        связанные объекты на всю страницу."""
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        return queryset.with_related()
+
+    def can_share_response(self, request):
+        """Выборки по избранному и списку покупок у каждого свои.
+
+        Значение параметра не разбирается: его понимает фильтр,
+        и любое написание «да» не должно попасть в общий кэш.
+        """
+        return not any(
+            name in request.query_params
+            for name in ('is_favorited', 'is_in_shopping_cart')
+        )
+
+    def personalize_shared_data(self, data, relations):
+        """Проставляет признаки пользователя в общий ответ."""
+        recipes = data['results'] if 'results' in data else [data]
+        for recipe in recipes:
+            recipe['is_favorited'] = recipe['id'] in relations.favorites
+            recipe['is_in_shopping_cart'] = (
+                recipe['id'] in relations.shopping_cart
+            )
+            recipe['author']['is_subscribed'] = (
+                recipe['author']['id'] in relations.follows
+            )
+        return data
+
+    def get_count_generations(self):
+        """Поколения данных, от которых зависит количество в списке."""
+        user_id = self.request.user.id
+        generations = ['recipes']
+        if 'is_favorited' in self.request.query_params:
+            generations.append(f'favorites:{user_id}')
+        if 'is_in_shopping_cart' in self.request.query_params:
+            generations.append(cart_generation(user_id))
+        return generations
+
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от действия."""
         if self.action in ('list', 'retrieve'):
@@ -190,9 +278,13 @@ class RecipeViewSet(ModelViewSet):
             return CreateRecipeSerializer
 
     def get_serializer_context(self):
-        """Добавление request в контекст сериализатора."""
+        """Добавление request в контекст сериализатора;
+        в списке вместо изображений отдаются миниатюры."""
         context = super().get_serializer_context()
-        context.update({'request': self.request})
+        context.update({
+            'request': self.request,
+            'thumbnails': self.action == 'list',
+        })
         return context
 
     def _toggle_relation(self, request, pk, model_class, related_name):
@@ -212,6 +304,7 @@ class RecipeViewSet(ModelViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            update_relation(user.id, model_class, recipe.id, present=True)
             response_serializer = AddFavoritesSerializer(recipe)
             return Response(
                 response_serializer.data,
@@ -227,6 +320,7 @@ class RecipeViewSet(ModelViewSet):
                     {'errors': f'Рецепт "{recipe.name}" не в {related_name}.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            update_relation(user.id, model_class, recipe.id, present=False)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -255,24 +349,220 @@ class RecipeViewSet(ModelViewSet):
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        url_path='feed',
+        url_name='feed',
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь,
+        от новых к старым; страницы листаются по ?cursor=."""
+        paginator = FeedPagination()
+        recipes = paginator.paginate_feed(
+            lambda cursor, limit: feed_page(request.user.id, cursor, limit),
+            request
+        )
+        serializer = RecipeSerializer(
+            recipes,
+            many=True,
+            context={'request': request, 'thumbnails': True}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(AllowAny,),
+        url_path='cookable',
+        url_name='cookable',
+    )
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из имеющихся продуктов.
+
+        ?ingredients=1,2,3 — id ингредиентов, ?limit=N — число рецептов.
+        Рецепты отсортированы по доле имеющихся ингредиентов, затем
+        по числу недостающих.
+        """
+        try:
+            ingredient_ids = [
+                int(value)
+                for value in request.query_params.get(
+                    'ingredients', ''
+                ).split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            ingredient_ids = []
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': 'Укажите id ингредиентов через запятую.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = cookable_index.search(
+            ingredient_ids, RecipePagination().get_page_size(request)
+        )
+        recipes = Recipe.objects.with_related().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        matches = [match for match in matches if match[0] in recipes]
+        serializer = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in matches],
+            many=True,
+            context={'request': request, 'thumbnails': True}
+        )
+        results = []
+        for data, (_, matched, missing) in zip(serializer.data, matches):
+            data.update(
+                matched=matched,
+                missing=missing,
+                match_ratio=round(matched / (matched + missing), 3)
+            )
+            results.append(data)
+        return Response(results)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        """Метод для загрузки списка покупок в pdf формате."""
+        """Метод для загрузки списка покупок.
+
+        Формат (pdf, txt, csv, json) выбирается параметром ?format=
+        или заголовком Accept, по умолчанию — pdf. Готовые документы
+        кэшируются до изменения списка покупок. С ?mode=async документ
+        формируется в фоне, а ответ 202 содержит адрес для загрузки.
+        """
+        renderer = request.accepted_renderer
+        key = (request.user.id, renderer.format)
+        version = tuple(get_generations(
+            (cart_generation(request.user.id), 'ingredients')
+        ))
+        content = shopping_list_cache.get(key, version)
+        if content is not None:
+            return self._shopping_list_response(
+                renderer.format, renderer.content_type, content
+            )
+
         ingredients = IngredientInRecipe.objects.filter(
             recipe__in_shopping_carts__user=request.user
         ).values(
             'ingredient__name',
             'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
+        ).annotate(sum=Sum('amount')).order_by('ingredient__name')
+
+        try:
+            if request.query_params.get('mode') == 'async':
+                job_id = render_pool.start_job(
+                    request.user.id,
+                    render_document, renderer, list(ingredients),
+                    callback=lambda result: shopping_list_cache.set(
+                        key, version, result[2]
+                    )
+                )
+                # Без параметров запроса: ?format= документа у адреса
+                # задачи дал бы 404 при согласовании формата ответа.
+                url = request.build_absolute_uri(reverse(
+                    'api:recipes-download_shopping_cart_job',
+                    kwargs={'job_id': job_id}
+                ))
+                return Response(
+                    {'job_id': job_id, 'url': url},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': url}
+                )
+            if renderer.offload:
+                _, _, content = render_pool.run(
+                    render_document, renderer, list(ingredients)
+                )
+                shopping_list_cache.set(key, version, content)
+                return self._shopping_list_response(
+                    renderer.format, renderer.content_type, content
+                )
+        except (RenderPoolBusyError, RenderTimeoutError):
+            return Response(
+                {'errors': 'Сервис формирования списка покупок перегружен, '
+                           'попробуйте позже.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
 
-        pdf_shopping_list = generate_shopping_list_pdf(ingredients)
-        response = FileResponse(
-            pdf_shopping_list,
-            content_type='application/pdf'
+        response = StreamingHttpResponse(
+            shopping_list_cache.cache_stream(
+                key, version, renderer.stream(ingredients.iterator())
+            ),
+            content_type=renderer.content_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.pdf"'
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        return response
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        url_path=r'download_shopping_cart/(?P<job_id>[0-9a-f]{32})',
+        url_name='download_shopping_cart_job',
+    )
+    def download_shopping_cart_job(self, request, job_id):
+        """Результат фонового формирования списка покупок."""
+        job = render_pool.get_job(job_id, request.user.id)
+        if job is None:
+            return Response(
+                {'errors': 'Задача не найдена.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        done, result = job
+        if not done:
+            return Response(
+                {'status': 'pending'}, status=status.HTTP_202_ACCEPTED
+            )
+        if result is None:
+            return Response(
+                {'errors': 'Не удалось сформировать список покупок.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return self._shopping_list_response(*result)
+
+    @staticmethod
+    def _shopping_list_response(file_format, content_type, content):
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{file_format}"'
         )
         return response
+
+
+class QueryStatsView(APIView):
+    """Статистика SQL-запросов и времени по маршрутам для персонала.
+
+    Данные накапливаются в памяти процесса, поэтому у каждого
+    воркера своя статистика (pid в ответе).
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(route_stats.snapshot())
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DatabaseStatsView(APIView):
+    """Настройки и счётчики соединений с базой текущего воркера."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'databases': {
+                connection.alias: connection.get_stats()
+                for connection in connections.all()
+                if hasattr(connection, 'get_stats')
+            },
+        })
@@ -0,0 +1,142 @@
+"""Ограниченный пул для тяжёлого рендеринга документов."""
+import logging
+import threading
+import uuid
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError)
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = 'render_job:{}'
+
+
+class RenderPoolBusyError(Exception):
+    """Все слоты пула заняты."""
+
+
+class RenderTimeoutError(Exception):
+    """Рендеринг не завершился за отведённое время."""
+
+
+class RenderPool:
+    """Пул потоков или процессов для рендеринга.
+
+    Число одновременно принятых задач ограничено семафором: если
+    все слоты заняты, задача сразу отклоняется и поток запроса
+    не ждёт. Синхронное ожидание результата ограничено таймаутом.
+    При backend='sync' задачи выполняются в вызывающем потоке.
+    """
+
+    def __init__(self, backend, workers, max_pending, timeout):
+        self.backend = backend
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                executor_class = (
+                    ProcessPoolExecutor if self.backend == 'process'
+                    else ThreadPoolExecutor
+                )
+                self._executor = executor_class(max_workers=self.workers)
+            return self._executor
+
+    def submit(self, func, *args):
+        """Ставит задачу в пул и возвращает Future."""
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusyError
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            logger.exception('Не удалось поставить задачу рендеринга в пул')
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        """Выполняет задачу в пуле и ждёт результат."""
+        if self.backend == 'sync':
+            return func(*args)
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise RenderTimeoutError
+
+    def start_job(self, owner_id, func, *args, callback=None):
+        """Запускает фоновую задачу и возвращает её идентификатор.
+
+        Состояние задачи хранится в кэше по умолчанию, поэтому
+        с общим кэшем результат можно забрать через любой воркер.
+        """
+        job_id = uuid.uuid4().hex
+        key = JOB_KEY.format(job_id)
+        cache.set(
+            key, (owner_id, False, None), settings.SHOPPING_LIST_JOB_TIMEOUT
+        )
+        try:
+            future = self.submit(func, *args)
+        except RenderPoolBusyError:
+            cache.delete(key)
+            raise
+
+        def done(future):
+            result = None
+            if future.cancelled():
+                logger.error('Задача рендеринга %s отменена', job_id)
+            elif future.exception() is not None:
+                logger.error(
+                    'Ошибка в задаче рендеринга %s', job_id,
+                    exc_info=future.exception()
+                )
+            else:
+                result = future.result()
+                if callback is not None:
+                    try:
+                        callback(result)
+                    except Exception:
+                        logger.exception(
+                            'Ошибка обработки результата задачи %s', job_id
+                        )
+            cache.set(
+                key, (owner_id, True, result),
+                settings.SHOPPING_LIST_JOB_TIMEOUT
+            )
+            if result is not None and cache.get(key) is None:
+                # Результат не поместился в кэш (у Memcached предел
+                # записи 1 МБ): задача не должна остаться «в работе».
+                logger.error('Результат задачи %s не сохранён', job_id)
+                cache.set(
+                    key, (owner_id, True, None),
+                    settings.SHOPPING_LIST_JOB_TIMEOUT
+                )
+
+        future.add_done_callback(done)
+        return job_id
+
+    def get_job(self, job_id, owner_id):
+        """Возвращает (готово ли, результат) или None для чужой задачи."""
+        stored = cache.get(JOB_KEY.format(job_id))
+        if stored is None:
+            return None
+        stored_owner_id, done, result = stored
+        if stored_owner_id != owner_id:
+            return None
+        return done, result
+
+
+render_pool = RenderPool(
+    backend=settings.SHOPPING_LIST_RENDER_BACKEND,
+    workers=settings.SHOPPING_LIST_RENDER_WORKERS,
+    max_pending=settings.SHOPPING_LIST_RENDER_MAX_PENDING,
+    timeout=settings.SHOPPING_LIST_RENDER_TIMEOUT,
+)
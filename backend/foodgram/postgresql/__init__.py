@@ -0,0 +1 @@
+"""PostgreSQL с проверкой соединений и пулом внутри процесса."""
@@ -0,0 +1,124 @@
+"""Бэкенд PostgreSQL с проверкой соединений и пулом.
+
+Дополнительные ключи DATABASES:
+
+- CONN_HEALTH_CHECKS — перед первым запросом в новом HTTP-запросе
+  постоянное соединение проверяется SELECT 1 и при ошибке
+  открывается заново (как в Django 4.1);
+- POOL — {'SIZE': N, 'TIMEOUT': секунды}: соединения берутся из пула
+  процесса на время HTTP-запроса и возвращаются в него по окончании.
+  CONN_MAX_AGE в этом режиме — срок жизни соединения в пуле.
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+from .pool import get_pool, get_stats
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool_created = None
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options or not options.get('SIZE'):
+            return None
+        return get_pool(
+            self.alias,
+            options['SIZE'],
+            options.get('TIMEOUT', 10),
+            self.settings_dict['CONN_MAX_AGE']
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            get_stats(self.alias).add('connects')
+            return super().get_new_connection(conn_params)
+
+        # Неисправное соединение из пула закрывается, поэтому цикл
+        # завершится не позже, чем пул откроет новое соединение.
+        while True:
+            connection, self.pool_created, reused = pool.get(
+                lambda: self._connect(conn_params)
+            )
+            if not reused:
+                return connection
+            if not self.health_check_enabled or self._check(connection):
+                options = self.settings_dict['OPTIONS']
+                self.isolation_level = options.get(
+                    'isolation_level', connection.isolation_level
+                )
+                return connection
+            pool.discard(connection)
+
+    def _connect(self, conn_params):
+        get_stats(self.alias).add('connects')
+        return super().get_new_connection(conn_params)
+
+    def _check(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except base.Database.Error:
+            get_stats(self.alias).add('health_check_failures')
+            return False
+        return True
+
+    def connect(self):
+        # Новое соединение проверять не нужно, а set_autocommit()
+        # внутри connect() уже вызывает ensure_connection().
+        self.health_check_done = True
+        super().connect()
+        if self.pool is not None:
+            # Соединение возвращается в пул в конце HTTP-запроса.
+            self.close_at = time.monotonic()
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django оставит ссылку на соединение до конца
+                # транзакции, поэтому вернуть его в пул нельзя.
+                pool.discard(self.connection)
+            else:
+                pool.put(self.connection, self.pool_created)
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.health_check_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                get_stats(self.alias).add('health_check_failures')
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def get_stats(self):
+        """Настройки и счётчики соединений текущего процесса."""
+        pool = self.pool
+        return {
+            'conn_max_age': self.settings_dict['CONN_MAX_AGE'],
+            'health_checks': self.health_check_enabled,
+            **get_stats(self.alias).snapshot(),
+            'pool': pool.snapshot() if pool is not None else None,
+        }
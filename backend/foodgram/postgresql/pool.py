@@ -0,0 +1,167 @@
+"""Пул соединений с PostgreSQL внутри процесса и счётчики соединений."""
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionStats:
+    """Счётчики соединений одного псевдонима базы в процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.health_check_failures = 0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'health_check_failures': self.health_check_failures,
+            }
+
+
+class ConnectionPool:
+    """Пул соединений процесса с ограничением размера.
+
+    Открыто не больше max_size соединений; если все заняты, get()
+    ждёт освобождения не дольше timeout секунд. Соединения старше
+    max_age секунд (None — без ограничения) закрываются при возврате.
+    """
+
+    def __init__(self, max_size, timeout, max_age):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._waiting = 0
+        self._stats = {
+            'checkouts': 0,
+            'reused': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'wait_ms': 0.0,
+        }
+
+    def get(self, connect):
+        """Свободное соединение или новое от connect().
+
+        Возвращает (соединение, время создания, взято ли из пула).
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            while not self._idle and self._open >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'Нет свободного соединения в пуле '
+                        f'из {self.max_size} за {self.timeout} с'
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._stats['checkouts'] += 1
+            self._stats['wait_ms'] += (time.monotonic() - started) * 1000
+            if self._idle:
+                self._stats['reused'] += 1
+                return (*self._idle.pop(), True)
+            self._open += 1
+        try:
+            return connect(), time.monotonic(), False
+        except Exception:
+            self._release(None)
+            raise
+
+    def put(self, connection, created):
+        """Возвращает соединение в пул или закрывает устаревшее."""
+        reusable = not connection.closed and (
+            self.max_age is None
+            or time.monotonic() - created < self.max_age
+        )
+        if reusable and (
+            connection.info.transaction_status != TRANSACTION_STATUS_IDLE
+        ):
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                reusable = False
+        if not reusable:
+            self.discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, created))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Закрывает соединение и освобождает его место в пуле."""
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        self._release(connection)
+
+    def _release(self, connection):
+        with self._condition:
+            self._open -= 1
+            if connection is not None:
+                self._stats['discarded'] += 1
+            self._condition.notify()
+
+    def snapshot(self):
+        with self._condition:
+            checkouts = self._stats['checkouts']
+            return {
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'reused': self._stats['reused'],
+                'timeouts': self._stats['timeouts'],
+                'discarded': self._stats['discarded'],
+                'avg_wait_ms': round(
+                    self._stats['wait_ms'] / checkouts, 3
+                ) if checkouts else 0.0,
+            }
+
+
+_lock = threading.Lock()
+_pools = {}
+_stats = {}
+
+
+def get_pool(alias, max_size, timeout, max_age):
+    """Пул псевдонима alias в текущем процессе.
+
+    После fork (воркеры gunicorn) создаётся новый пул: соединения
+    родителя дочерним процессам не передаются.
+    """
+    with _lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            _pools[alias] = ConnectionPool(max_size, timeout, max_age)
+        return _pools[alias]
+
+
+def get_stats(alias):
+    """Счётчики соединений псевдонима alias."""
+    with _lock:
+        return _stats.setdefault(alias, ConnectionStats())
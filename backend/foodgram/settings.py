@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,15 +65,43 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
 
+# Соединения с базой: DB_CONN_MAX_AGE — сколько секунд держать
+# соединение воркера (0 — закрывать после каждого запроса),
+# DB_CONN_HEALTH_CHECKS — проверять его перед повторным использованием,
+# DB_POOL_SIZE — пул из стольких соединений на процесс (0 — без пула),
+# DB_POOL_TIMEOUT — сколько секунд ждать свободного соединения пула.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.postgresql',
         'NAME': os.getenv('DB_NAME', default='foodgram'),
         'USER': os.getenv('POSTGRES_USER', default='foodgram_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.getenv('DB_CONN_HEALTH_CHECKS', '1'))
+        ),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', '0')),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+}
+
+# Поколения данных (api.cache), по которым сбрасываются кэши и индексы
+# воркеров, и состояние фоновых задач хранятся в этом кэше. LocMem виден
+# только своему процессу и годится для одного процесса; при нескольких
+# воркерах нужен общий кэш, например Memcached (docker-compose).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
     }
 }
 
@@ -115,12 +144,39 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
     'PAGE_SIZE': 6,
 }
 
+# Лента подписок: с этого числа подписок лента подписчика
+# материализуется (FeedEntry), иначе собирается слиянием по авторам.
+FEED_INBOX_MIN_FOLLOWS = int(os.getenv('FEED_INBOX_MIN_FOLLOWS', '20'))
+FEED_BATCH_SIZE = 1000
+
+# Заголовок Server-Timing с временем в базе и в Python.
+SERVER_TIMING = bool(int(os.getenv('SERVER_TIMING', '1')))
+
+# Наибольшее число SQL-запросов на маршрут: метод и имя из urls.
+# QUERY_BUDGET_MODE: log — предупреждение в лог, raise — ошибка (для тестов).
+QUERY_BUDGETS = {
+    'GET api:recipes-list': 10,
+    'GET api:recipes-detail': 10,
+    'GET api:users-list': 6,
+    'GET api:users-subscriptions': 8,
+    'GET api:recipes-feed': 10,
+    'GET api:recipes-download_shopping_cart': 6,
+}
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', default='log')
+
+# Кэш соответствия токена пользователю (0 — отключён). С кэшем в памяти
+# процесса (LocMem) не используется: отзыв токена не дошёл бы до других
+# воркеров.
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=str(60 * 5))
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
@@ -143,3 +199,41 @@ DATA_DIRECTORY = os.path.join(BASE_DIR, 'data')
 
 PAGINATION_PAGE_SIZE = 6
 PAGINATION_MAX_PAGE_SIZE = 100
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+# Выше этого числа строк (по оценке PostgreSQL) COUNT(*) не выполняется.
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = (
+    int(os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD'))
+    if os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD') else None
+)
+
+INGREDIENT_SEARCH_LIMIT = 50
+# Без PostgreSQL: сколько лучших результатов поиска рецептов учитывать.
+RECIPE_SEARCH_FALLBACK_LIMIT = 500
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Общие ответы со списками рецептов: срок свежести и срок хранения,
+# в течение которого устаревшая копия отдаётся во время пересчёта.
+SHARED_CACHE_FRESH_TIMEOUT = 60
+SHARED_CACHE_TIMEOUT = 60 * 10
+
+# Множества id избранного, списка покупок и подписок пользователя.
+RELATIONS_CACHE_TIMEOUT = 60 * 10
+
+SHOPPING_LIST_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 10
+
+# Рендеринг PDF: sync, thread или process.
+SHOPPING_LIST_RENDER_BACKEND = os.getenv(
+    'SHOPPING_LIST_RENDER_BACKEND', default='thread'
+)
+SHOPPING_LIST_RENDER_WORKERS = int(
+    os.getenv('SHOPPING_LIST_RENDER_WORKERS', default='2')
+)
+SHOPPING_LIST_RENDER_MAX_PENDING = int(
+    os.getenv('SHOPPING_LIST_RENDER_MAX_PENDING', default='8')
+)
+SHOPPING_LIST_RENDER_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_RENDER_TIMEOUT', default='30')
+)
+SHOPPING_LIST_JOB_TIMEOUT = 60 * 10
@@ -1,13 +1,13 @@
 from admin_auto_filters.filters import AutocompleteFilter
 from django.contrib.admin import ModelAdmin, register
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Count
 
 from .models import (
     Favorite, Follow, Ingredient,
     IngredientInRecipe, Recipe,
     ShoppingCart, Tag, User
 )
+from .signals import recipe_ingredients_changed
 
 
 class AuthorFilter(AutocompleteFilter):
@@ -51,13 +51,13 @@ class RecipeAdmin(ModelAdmin):
     search_fields = ('name', 'author__username', 'tags__name')
     ordering = ('-created',)
 
+    readonly_fields = ('favorites_count', 'shopping_cart_count')
+
     def get_queryset(self, request):
-        """Оптимизация: аннотация + prefetch."""
+        """Оптимизация: prefetch, счётчик избранного хранится в рецепте."""
         return super().get_queryset(request).prefetch_related(
             'tags',
             'author'
-        ).annotate(
-            favorites_count=Count('in_favorites')
         )
 
     def get_favorites_count(self, obj):
@@ -95,6 +95,28 @@ class IngredientInRecipeAdmin(ModelAdmin):
     list_filter = (RecipeFilter, IngredientFilter)
     ordering = ('recipe',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recipe_ids = {obj.recipe_id}
+        if change and 'recipe' in form.changed_data:
+            # Строку перенесли в другой рецепт: изменились оба.
+            recipe_ids.add(form.initial['recipe'])
+        self.ingredients_changed(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.ingredients_changed({obj.recipe_id})
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.ingredients_changed(recipe_ids)
+
+    def ingredients_changed(self, recipe_ids):
+        recipe_ingredients_changed.send(
+            sender=IngredientInRecipe, recipe_ids=recipe_ids
+        )
+
 
 @register(ShoppingCart)
 class ShoppingCartAdmin(ModelAdmin):
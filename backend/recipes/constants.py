@@ -13,3 +13,8 @@ RECIPE_NAME_LENGTH = 256
 MIN_COOKING_TIME_VALUE = 1
 MAX_COOKING_TIME_VALUE = 1440
 MIN_AMOUNT_INGREDIENT = 1
+
+IMAGE_MAX_DIMENSION = 1600
+IMAGE_QUALITY = 80
+RECIPE_THUMBNAIL_SIZE = (480, 320)
+AVATAR_THUMBNAIL_SIZE = (96, 96)
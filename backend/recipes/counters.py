@@ -0,0 +1,28 @@
+"""Пересчёт денормализованных счётчиков."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    """Подзапрос числа строк model, ссылающихся на внешний объект."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def recount(queryset, field, model, related_field):
+    """Исправляет расхождения счётчика field, возвращает их число."""
+    actual = count_subquery(model, related_field)
+    drifted = queryset.annotate(actual=actual).exclude(
+        **{field: F('actual')}
+    )
+    return queryset.filter(
+        pk__in=Subquery(drifted.values('pk'))
+    ).update(**{field: actual})
@@ -0,0 +1,158 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Ключ ленты — пара (created, id рецепта), по убыванию. Для подписчика
+с небольшим числом подписок лента собирается одним запросом из срезов
+по авторам, объединённых UNION ALL: у каждого автора читается
+не больше limit последних рецептов по индексу (author, -created, -id).
+Для подписчиков с FEED_INBOX_MIN_FOLLOWS подписок и более лента
+материализуется в FeedEntry: новый рецепт раскладывается в ленты таких
+подписчиков при публикации, а подписка и отписка добавляют или удаляют
+рецепты автора.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Recipe, User
+
+
+def uses_inbox(follows_count):
+    """Ведётся ли для подписчика материализованная лента."""
+    return follows_count >= settings.FEED_INBOX_MIN_FOLLOWS
+
+
+def _before(cursor, id_field):
+    """Условие «ключ меньше курсора».
+
+    Условие created <= курсора ограничивает диапазон индекса,
+    OR в PostgreSQL применяется только как фильтр строк.
+    """
+    if cursor is None:
+        return Q()
+    created, pk = cursor
+    return Q(
+        Q(created__lt=created) | Q(created=created, **{
+            f'{id_field}__lt': pk
+        }),
+        created__lte=created
+    )
+
+
+def merged_keys(user_id, cursor, limit):
+    """Слияние срезов ключей по авторам одним запросом.
+
+    Базы без LIMIT в частях UNION (SQLite) читают срезы по одному,
+    и они сливаются здесь.
+    """
+    author_ids = Follow.objects.filter(
+        user_id=user_id, author__recipes_count__gt=0
+    ).values_list('author_id', flat=True)
+    slices = [
+        Recipe.objects.filter(
+            _before(cursor, 'id'), author_id=author_id
+        ).order_by('-created', '-id').values_list('created', 'id')[:limit]
+        for author_id in author_ids
+    ]
+    if len(slices) < 2:
+        return list(slices[0]) if slices else []
+    if not connection.features.supports_slicing_ordering_in_compound:
+        return list(islice(heapq.merge(
+            *(list(keys) for keys in slices), reverse=True
+        ), limit))
+    return list(slices[0].union(*slices[1:], all=True).order_by(
+        '-created', '-id'
+    )[:limit])
+
+
+def inbox_keys(user_id, cursor, limit):
+    """Ключи из материализованной ленты."""
+    return list(FeedEntry.objects.filter(
+        _before(cursor, 'recipe_id'), user_id=user_id
+    ).order_by('-created', '-recipe_id').values_list(
+        'created', 'recipe_id'
+    )[:limit])
+
+
+def feed_page(user_id, cursor, limit):
+    """Не больше limit рецептов ленты с ключом меньше cursor."""
+    # Счётчик читается из базы: пользователь запроса мог быть взят
+    # из кэша аутентификации до изменения подписок.
+    follows_count = User.objects.filter(pk=user_id).values_list(
+        'follows_count', flat=True
+    ).first() or 0
+    if uses_inbox(follows_count):
+        keys = inbox_keys(user_id, cursor, limit)
+    else:
+        keys = merged_keys(user_id, cursor, limit)
+    recipes = Recipe.objects.with_related().in_bulk(
+        [pk for _, pk in keys]
+    )
+    return [recipes[pk] for _, pk in keys if pk in recipes]
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в материализованные ленты подписчиков."""
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe=recipe, created=recipe.created)
+            for user_id in Follow.objects.filter(
+                author_id=recipe.author_id,
+                user__follows_count__gte=settings.FEED_INBOX_MIN_FOLLOWS
+            ).values_list('user_id', flat=True).iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def add_author(user_id, author_ids):
+    """Добавляет в ленту подписчика рецепты авторов."""
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, created=created)
+            for recipe_id, created in Recipe.objects.filter(
+                author_id__in=author_ids
+            ).values_list('id', 'created').iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def follow_added(user_id, author_id):
+    """Подписка: лента дополняется или, при переходе порога,
+    собирается целиком."""
+    follows_count = User.objects.filter(pk=user_id).values_list(
+        'follows_count', flat=True
+    ).first() or 0
+    if not uses_inbox(follows_count):
+        return
+    if uses_inbox(follows_count - 1):
+        add_author(user_id, [author_id])
+    else:
+        rebuild(user_id)
+
+
+def follow_removed(user_id, author_id):
+    """Отписка: рецепты автора или, при переходе порога,
+    вся лента удаляются."""
+    follows_count = User.objects.filter(pk=user_id).values_list(
+        'follows_count', flat=True
+    ).first()
+    if follows_count is None or not uses_inbox(follows_count + 1):
+        return
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    if uses_inbox(follows_count):
+        entries = entries.filter(recipe__author_id=author_id)
+    entries.delete()
+
+
+def rebuild(user_id):
+    """Собирает материализованную ленту подписчика заново."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    add_author(user_id, Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True))
@@ -0,0 +1,58 @@
+"""Обработка загружаемых изображений."""
+from io import BytesIO
+from pathlib import PurePath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .constants import IMAGE_MAX_DIMENSION, IMAGE_QUALITY
+
+RESAMPLE = Image.Resampling.LANCZOS
+
+
+def output_format():
+    """WebP, если Pillow собран с его поддержкой, иначе JPEG."""
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def encode_image(image, name, icc_profile=None):
+    """Кодирует изображение заново; EXIF и прочие метаданные
+    не переносятся, сохраняется только цветовой профиль."""
+    image_format, extension = output_format()
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    if image_format == 'JPEG' and has_alpha:
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, 'white')
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    options = {'quality': IMAGE_QUALITY}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue(), name=f'{name}.{extension}')
+
+
+def process_image(file, thumbnail_size):
+    """Возвращает (изображение, миниатюра) для загруженного файла.
+
+    Изображение поворачивается по EXIF, уменьшается до
+    IMAGE_MAX_DIMENSION по большей стороне и кодируется заново.
+    Миниатюра обрезается до точного размера thumbnail_size.
+    """
+    file.seek(0)
+    with Image.open(file) as source:
+        icc_profile = source.info.get('icc_profile')
+        image = ImageOps.exif_transpose(source)
+    image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), RESAMPLE)
+    thumbnail = ImageOps.fit(image, thumbnail_size, RESAMPLE)
+    name = PurePath(file.name).stem
+    return (
+        encode_image(image, name, icc_profile),
+        encode_image(thumbnail, f'{name}_thumb', icc_profile),
+    )
@@ -0,0 +1,209 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import (Favorite, Follow, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag, User)
+
+from api.cache import bump_generation
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса популярности: k-й элемент выбирается
+    примерно в 1 / k ** skew раз реже первого."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+def pick_unique(rng, population, cum_weights, count):
+    """До count различных элементов с учётом весов популярности."""
+    if count <= 0:
+        return set()
+    picked = set()
+    for _ in range(4):
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(picked)
+        ))
+        if len(picked) >= count:
+            break
+    return picked
+
+
+class Command(BaseCommand):
+    """Команда для генерации синтетических пользователей и рецептов"""
+
+    help = (
+        'Генерация пользователей, рецептов, избранного, списков покупок '
+        'и подписок с неравномерной популярностью'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=5000,
+            help='Количество рецептов'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Среднее число ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--favorites-per-user', type=int, default=20,
+            help='Среднее число рецептов в избранном'
+        )
+        parser.add_argument(
+            '--cart-per-user', type=int, default=5,
+            help='Среднее число рецептов в списке покупок'
+        )
+        parser.add_argument(
+            '--follows-per-user', type=int, default=10,
+            help='Среднее число подписок'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пакета для вставки'
+        )
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Нет ингредиентов или тегов, сначала выполните import_data'
+            )
+        self.rng = random.Random(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            user_ids = self._create_users(options['users'])
+            recipe_ids = self._create_recipes(
+                options['recipes'], user_ids, ingredient_ids, tag_ids,
+                options['ingredients_per_recipe']
+            )
+            self._create_relations(
+                Favorite, 'recipe_id', user_ids, recipe_ids,
+                options['favorites_per_user']
+            )
+            self._create_relations(
+                ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+                options['cart_per_user']
+            )
+            self._create_relations(
+                Follow, 'author_id', user_ids, user_ids,
+                options['follows_per_user']
+            )
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        bump_generation('users', 'authors', 'recipes', 'recipe_ingredients')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {len(user_ids)} пользователей и {len(recipe_ids)} '
+            f'рецептов за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def _create_users(self, count):
+        offset = User.objects.count()
+        password = make_password('benchmark')
+        users = [
+            User(
+                email=f'bench{number}@example.com',
+                username=f'bench{number}',
+                first_name='Бенчмарк',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(offset, offset + count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('id', flat=True))
+
+    def _create_recipes(self, count, user_ids, ingredient_ids, tag_ids,
+                        ingredients_per_recipe):
+        rng = self.rng
+        authors = rng.choices(
+            user_ids, cum_weights=zipf_weights(len(user_ids), self.skew),
+            k=count
+        )
+        ingredient_weights = zipf_weights(len(ingredient_ids), self.skew)
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {number}',
+                    text='Синтетический рецепт для нагрузочных тестов.',
+                    cooking_time=rng.randint(5, 180),
+                )
+                for number, author_id in enumerate(authors)
+            ),
+            batch_size=self.batch_size
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            id__gt=last_id
+        ).values_list('id', flat=True))
+
+        IngredientInRecipe.objects.bulk_create(
+            (
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in pick_unique(
+                    rng, ingredient_ids, ingredient_weights,
+                    rng.randint(1, 2 * ingredients_per_recipe - 1)
+                )
+            ),
+            batch_size=self.batch_size
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, min(3, len(tag_ids)))
+                )
+            ),
+            batch_size=self.batch_size
+        )
+        return recipe_ids
+
+    def _create_relations(self, model, field, user_ids, target_ids, mean):
+        """Связи пользователей с популярными в первую очередь объектами."""
+        rng = self.rng
+        targets = target_ids[:]
+        rng.shuffle(targets)
+        weights = zipf_weights(len(targets), self.skew)
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, **{field: target_id})
+                for user_id in user_ids
+                for target_id in pick_unique(
+                    rng, targets, weights, rng.randint(0, 2 * mean)
+                )
+                if target_id != user_id or model is not Follow
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from recipes.images import process_image
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    """Команда для создания миниатюр уже загруженных изображений"""
+
+    help = 'Создание недостающих миниатюр рецептов и аватаров'
+
+    def handle(self, *args, **options):
+        for model in (Recipe, User):
+            for field_name, (thumbnail_name, size) in (
+                model.image_fields.items()
+            ):
+                queryset = model.objects.exclude(
+                    **{field_name: ''}
+                ).filter(**{thumbnail_name: ''})
+                created = 0
+                for obj in queryset.iterator():
+                    image = getattr(obj, field_name)
+                    try:
+                        with image.open('rb'):
+                            _, thumbnail = process_image(image, size)
+                    except (OSError, ValueError) as error:
+                        self.stdout.write(self.style.WARNING(
+                            f'{model.__name__} {obj.pk}: {error}'
+                        ))
+                        continue
+                    getattr(obj, thumbnail_name).save(
+                        thumbnail.name, thumbnail, save=False
+                    )
+                    obj.save(update_fields=[thumbnail_name])
+                    created += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model.__name__}.{field_name}: '
+                    f'создано {created} миниатюр'
+                ))
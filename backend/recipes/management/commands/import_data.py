@@ -1,15 +1,93 @@
 import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from recipes.models import Ingredient, Tag
 
 from django.conf import settings
 
+from api.cache import bump_generation
+
+READ_CHUNK_SIZE = 64 * 1024
+# Пробелы и запятые между элементами массива JSON.
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv_rows(file):
+    """Построчно читает пары (название, единица измерения) из CSV."""
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if reader.line_num == 1 and row[:2] == ['name', 'measurement_unit']:
+            continue
+        yield row[0], row[1]
+
+
+def read_json_rows(file):
+    """Потоково читает массив объектов JSON, не загружая файл целиком.
+
+    Разбор идёт по смещению в буфере: остаток буфера копируется
+    только при дочитывании следующего блока файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается массив JSON')
+    position = 1
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+class RowStream:
+    """Файлоподобный объект, отдающий строки в формате CSV для COPY."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            writer.writerow(row)
+            self.count += 1
+            self._buffer += output.getvalue()
+            output.seek(0)
+            output.truncate()
+        if size < 0:
+            size = len(self._buffer)
+        buffer = self._buffer
+        self._buffer = buffer[size:]
+        return buffer[:size]
+
 
 class Command(BaseCommand):
     """Команда для загрузки ингредиентов и тегов в базу данных"""
 
-    help = 'Загрузка данных из CSV файлов (ингредиенты и теги)'
+    help = 'Загрузка данных из CSV/JSON файлов (ингредиенты и теги)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -22,6 +100,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Загрузить только теги'
         )
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.DATA_DIRECTORY, 'ingredients.csv'),
+            help='Файл ингредиентов (.csv или .json)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пакета для вставки ингредиентов'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL'
+        )
 
     def handle(self, *args, **options):
         load_ingredients = options['ingredients']
@@ -30,42 +124,88 @@ class Command(BaseCommand):
         load_all = not (load_ingredients or load_tags)
 
         if load_all or load_ingredients:
-            self._import_ingredients()
+            self._import_ingredients(
+                options['path'],
+                options['batch_size'],
+                use_copy=(
+                    connection.vendor == 'postgresql'
+                    and not options['no_copy']
+                )
+            )
 
         if load_all or load_tags:
             self._import_tags()
 
-    def _import_ingredients(self):
-        """Импорт ингредиентов из CSV"""
+    def _import_ingredients(self, path, batch_size, use_copy):
+        """Импорт ингредиентов из CSV или JSON с пропуском дубликатов."""
+        read_rows = (
+            read_json_rows if path.endswith('.json') else read_csv_rows
+        )
         try:
-            with open(
-                f'{settings.DATA_DIRECTORY}/ingredients.csv',
-                encoding='utf-8'
-            ) as file:
-                reader = csv.reader(file)
-                next(reader)
-                ingredients = [
-                    Ingredient(
-                        name=row[0],
-                        measurement_unit=row[1],
-                    )
-                    for row in reader
-                ]
-                created_count = Ingredient.objects.bulk_create(ingredients)
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Успешно загружено {len(created_count)} ингредиентов'
-                    )
+            with open(path, encoding='utf-8') as file:
+                started = time.perf_counter()
+                count_before = Ingredient.objects.count()
+                rows = read_rows(file)
+                if use_copy:
+                    total = self._copy_ingredients(rows)
+                else:
+                    total = self._bulk_create_ingredients(rows, batch_size)
+                created_count = Ingredient.objects.count() - count_before
+                elapsed = time.perf_counter() - started
+            bump_generation('ingredients')
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Успешно загружено {created_count} ингредиентов '
+                    f'(прочитано {total} строк за {elapsed:.2f} с, '
+                    f'{total / max(elapsed, 1e-6):.0f} строк/с)'
                 )
+            )
         except FileNotFoundError:
             self.stdout.write(
-                self.style.ERROR('Файл ingredients.csv не найден')
+                self.style.ERROR(f'Файл {path} не найден')
             )
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Ошибка при загрузке ингредиентов: {str(e)}')
             )
 
+    @staticmethod
+    def _bulk_create_ingredients(rows, batch_size):
+        """Пакетная вставка через ORM, существующие строки пропускаются."""
+        total = 0
+        while True:
+            batch = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                return total
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+
+    @staticmethod
+    def _copy_ingredients(rows):
+        """Загрузка через COPY во временную таблицу и INSERT ON CONFLICT."""
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        stream = RowStream(rows)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE import_ingredient '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.cursor.copy_expert(
+                'COPY import_ingredient (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                stream
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM import_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return stream.count
+
     def _import_tags(self):
         """Импорт тегов из CSV"""
         try:
@@ -74,13 +214,13 @@ class Command(BaseCommand):
                 encoding='utf-8'
             ) as file:
                 reader = csv.reader(file)
-                created_count = 0
-                for row in reader:
-                    Tag.objects.get_or_create(
-                        name=row[0],
-                        slug=row[1]
-                    )
-                    created_count += 1
+                count_before = Tag.objects.count()
+                Tag.objects.bulk_create(
+                    [Tag(name=row[0], slug=row[1]) for row in reader if row],
+                    ignore_conflicts=True
+                )
+                created_count = Tag.objects.count() - count_before
+                bump_generation('tags')
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'Успешно загружено {created_count} тегов'
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild
+from recipes.models import FeedEntry, User
+
+
+class Command(BaseCommand):
+    """Команда для пересборки материализованных лент подписчиков"""
+
+    help = (
+        'Пересборка лент подписчиков с FEED_INBOX_MIN_FOLLOWS '
+        'подписок и более, удаление остальных лент'
+    )
+
+    def handle(self, *args, **options):
+        threshold = settings.FEED_INBOX_MIN_FOLLOWS
+        FeedEntry.objects.exclude(
+            user__follows_count__gte=threshold
+        ).delete()
+        user_ids = User.objects.filter(
+            follows_count__gte=threshold
+        ).values_list('id', flat=True)
+        for user_id in user_ids:
+            rebuild(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}, '
+            f'записей: {FeedEntry.objects.count()}'
+        ))
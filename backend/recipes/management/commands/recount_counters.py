@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+from recipes.models import Favorite, Follow, Recipe, ShoppingCart, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+    (User, 'follows_count', Follow, 'user'),
+)
+
+
+class Command(BaseCommand):
+    """Команда для пересчёта денормализованных счётчиков"""
+
+    help = (
+        'Пересчёт счётчиков избранного, покупок, рецептов, '
+        'подписчиков и подписок'
+    )
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            fixed = recount(
+                model.objects.all(), field, related_model, related_field
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{model.__name__}.{field}: исправлено {fixed} записей'
+                )
+            )
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+# Наибольшее значение PositiveSmallIntegerField.
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сводит повторно загруженные ингредиенты к одной записи.
+
+    Если в рецепте есть несколько дублей одного ингредиента, остаётся
+    первая строка, а количества остальных прибавляются к ней.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+    for group in duplicates.iterator():
+        group_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).values_list('id', flat=True))
+        kept = {}
+        merged = set()
+        redundant_ids = []
+        for row_id, recipe_id, amount in IngredientInRecipe.objects.filter(
+            ingredient_id__in=group_ids
+        ).order_by('ingredient_id', 'id').values_list(
+            'id', 'recipe_id', 'amount'
+        ):
+            if recipe_id in kept:
+                kept[recipe_id][1] += amount
+                merged.add(recipe_id)
+                redundant_ids.append(row_id)
+            else:
+                kept[recipe_id] = [row_id, amount]
+        IngredientInRecipe.objects.filter(id__in=redundant_ids).delete()
+        for recipe_id in merged:
+            row_id, amount = kept[recipe_id]
+            IngredientInRecipe.objects.filter(id=row_id).update(
+                amount=min(amount, MAX_AMOUNT)
+            )
+        IngredientInRecipe.objects.filter(
+            ingredient_id__in=group_ids
+        ).update(ingredient_id=group['keep_id'])
+        Ingredient.objects.filter(id__in=group_ids).exclude(
+            id=group['keep_id']
+        ).delete()
+    # Отложенные проверки внешних ключей выполняются сейчас, иначе
+    # PostgreSQL не даст добавить ограничение в той же транзакции.
+    schema_editor.connection.check_constraints()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:53
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Вектор: название (вес A), ингредиенты (B), описание (C).
+# Конфигурация поиска задаётся только функцией recipes_search_config():
+# её используют и триггеры, и запросы (api.filters). Сменить её можно
+# новой миграцией, которая пересоздаст функцию и пересчитает векторы.
+CREATE_SQL = (
+    """
+    CREATE FUNCTION recipes_search_config() RETURNS regconfig
+    LANGUAGE sql IMMUTABLE AS $$ SELECT 'russian'::regconfig $$
+    """,
+    """
+    CREATE FUNCTION recipes_search_vector(
+        p_recipe_id bigint, p_name text, p_text text
+    ) RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector(
+                recipes_search_config(), coalesce(p_name, '')
+            ), 'A')
+            || setweight(to_tsvector(recipes_search_config(), coalesce((
+                SELECT string_agg(i.name, ' ')
+                FROM recipes_ingredientinrecipe ir
+                JOIN recipes_ingredient i ON i.id = ir.ingredient_id
+                WHERE ir.recipe_id = p_recipe_id
+            ), '')), 'B')
+            || setweight(to_tsvector(
+                recipes_search_config(), coalesce(p_text, '')
+            ), 'C')
+    $$
+    """,
+    """
+    CREATE FUNCTION recipes_recipe_search_trigger() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := recipes_search_vector(NEW.id, NEW.name, NEW.text);
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_trigger()
+    """,
+    """
+    CREATE FUNCTION recipes_ingredients_search_trigger() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE recipes_recipe r
+        SET search_vector = recipes_search_vector(r.id, r.name, r.text)
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_insert
+    AFTER INSERT ON recipes_ingredientinrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_update
+    AFTER UPDATE ON recipes_ingredientinrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredients_search_delete
+    AFTER DELETE ON recipes_ingredientinrecipe
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredients_search_trigger()
+    """,
+    """
+    CREATE FUNCTION recipes_ingredient_rename_trigger() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE recipes_recipe r
+        SET search_vector = recipes_search_vector(r.id, r.name, r.text)
+        WHERE r.id IN (
+            SELECT recipe_id FROM recipes_ingredientinrecipe
+            WHERE ingredient_id = NEW.id
+        );
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_ingredient_rename
+    AFTER UPDATE OF name ON recipes_ingredient
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION recipes_ingredient_rename_trigger()
+    """,
+    """
+    UPDATE recipes_recipe
+    SET search_vector = recipes_search_vector(id, name, text)
+    """,
+    """
+    CREATE INDEX recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector)
+    """,
+)
+
+DROP_SQL = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+    'DROP TRIGGER IF EXISTS recipes_ingredient_rename ON recipes_ingredient',
+    'DROP FUNCTION IF EXISTS recipes_ingredient_rename_trigger()',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_delete '
+    'ON recipes_ingredientinrecipe',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_update '
+    'ON recipes_ingredientinrecipe',
+    'DROP TRIGGER IF EXISTS recipes_ingredients_search_insert '
+    'ON recipes_ingredientinrecipe',
+    'DROP FUNCTION IF EXISTS recipes_ingredients_search_trigger()',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_search_vector(bigint, text, text)',
+    'DROP FUNCTION IF EXISTS recipes_search_config()',
+)
+
+
+def run_on_postgresql(statements):
+    """Выполняет SQL только на PostgreSQL; на других СУБД
+    поиск работает через индекс в памяти процесса."""
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)
+        ),
+    ]
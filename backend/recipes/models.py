@@ -1,19 +1,70 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxValueValidator,
                                     MinValueValidator,
                                     RegexValidator,)
-from django.db import models
+from django.db import connections, models
 
-from .constants import (EMAIL_LENGTH, FIRST_NAME_LENGTH,
+from .constants import (AVATAR_THUMBNAIL_SIZE, EMAIL_LENGTH,
+                        FIRST_NAME_LENGTH,
                         INGREDIENT_MEASUREMENT_UNIT_LENGTH,
                         INGREDIENT_NAME_LENGTH, LAST_NAME_LENGTH,
                         MIN_AMOUNT_INGREDIENT, MIN_COOKING_TIME_VALUE,
-                        RECIPE_NAME_LENGTH, TAG_NAME_LENGTH, TAG_SLUG_LENGTH,
+                        RECIPE_NAME_LENGTH, RECIPE_THUMBNAIL_SIZE,
+                        TAG_NAME_LENGTH, TAG_SLUG_LENGTH,
                         MAX_COOKING_TIME_VALUE,
                         USERNAME_LENGTH)
+from .images import process_image
 
 
-class User(AbstractUser):
+class DatabaseManagedFieldsMixin:
+    """Исключает из обычного сохранения поля, которые ведёт база.
+
+    counter_fields — счётчики, которые меняются только атомарными
+    UPDATE с F-выражениями; trigger_fields — поля, которые заполняют
+    триггеры PostgreSQL. save() существующего объекта не должен
+    затирать их значениями, прочитанными ранее.
+    """
+
+    counter_fields = ()
+    trigger_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = (*self.counter_fields, *self.trigger_fields)
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class ProcessedImagesMixin:
+    """Обрабатывает новые изображения перед сохранением модели.
+
+    image_fields: поле изображения -> (поле миниатюры, размер).
+    Только что загруженный файл уменьшается и кодируется заново,
+    а рядом сохраняется миниатюра фиксированного размера.
+    """
+
+    image_fields = {}
+
+    def save(self, *args, **kwargs):
+        for field_name, (thumbnail_name, size) in self.image_fields.items():
+            image = getattr(self, field_name)
+            thumbnail = getattr(self, thumbnail_name)
+            if image and not image._committed:
+                image, new_thumbnail = process_image(image, size)
+                setattr(self, field_name, image)
+                if thumbnail:
+                    thumbnail.delete(save=False)
+                setattr(self, thumbnail_name, new_thumbnail)
+            elif not image and thumbnail:
+                thumbnail.delete(save=False)
+        super().save(*args, **kwargs)
+
+
+class User(DatabaseManagedFieldsMixin, ProcessedImagesMixin, AbstractUser):
     """Кастомная модель пользователя для приложения foodgram."""
 
     email = models.EmailField(
@@ -54,6 +105,36 @@ class User(AbstractUser):
         help_text='Рекомендуемый размер: 200x200 пикселей, формат— JPG или PNG'
     )
 
+    avatar_thumbnail = models.ImageField(
+        upload_to='avatars/thumbnails/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра аватара'
+    )
+
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    follows_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписок'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count', 'follows_count')
+    image_fields = {
+        'avatar': ('avatar_thumbnail', AVATAR_THUMBNAIL_SIZE),
+    }
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -66,6 +147,11 @@ class User(AbstractUser):
         """Строковое представление объекта пользователя."""
         return self.username
 
+    @property
+    def avatar_preview(self):
+        """Миниатюра аватара, а если её ещё нет — сам аватар."""
+        return self.avatar_thumbnail or self.avatar
+
 
 class Tag(models.Model):
     """Модель для описания тега."""
@@ -121,12 +207,59 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient',
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def latest_per_author(self, limit, author_ids):
+        """Оставляет не более limit последних рецептов каждого автора.
+
+        Для каждого автора — свой подзапрос с LIMIT по индексу
+        recipe_author_created_idx, подзапросы объединяются UNION ALL.
+        Так читается не больше limit строк индекса на автора, сколько
+        бы рецептов у него ни было. Порядок (-created, -id) однозначен
+        при совпадающих датах. Базы без LIMIT в частях UNION (SQLite)
+        выполняют подзапросы по одному.
+        """
+        latest = [
+            Recipe.objects.filter(author_id=author_id).order_by(
+                '-created', '-id'
+            ).values_list('pk', flat=True)[:limit]
+            for author_id in author_ids
+        ]
+        if not latest:
+            return self.none()
+        features = connections[self.db].features
+        if features.supports_slicing_ordering_in_compound:
+            latest = latest[0].union(*latest[1:], all=True)
+        else:
+            latest = [pk for ids in latest for pk in ids]
+        return self.filter(pk__in=latest).order_by('-created', '-id')
+
+
+class Recipe(DatabaseManagedFieldsMixin, ProcessedImagesMixin, models.Model):
     """Модель для описания рецепта."""
 
     author = models.ForeignKey(
@@ -145,6 +278,12 @@ class Recipe(models.Model):
         blank=True,
         help_text='Максимальный размер — 5 МБ, формат — JPG, PNG'
     )
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        upload_to='recipes/thumbnails/',
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
@@ -169,18 +308,56 @@ class Recipe(models.Model):
     )
     created = models.DateTimeField(
         auto_now_add=True,
-        db_index=True,
         verbose_name='Дата публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в избранное (раз)'
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлено в списки покупок (раз)'
+    )
+    # Заполняется триггерами PostgreSQL (миграция 0006).
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+    trigger_fields = ('search_vector',)
+    image_fields = {
+        'image': ('image_thumbnail', RECIPE_THUMBNAIL_SIZE),
+    }
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(
+                fields=('-created', '-id'),
+                name='recipe_created_idx'
+            ),
+            models.Index(
+                fields=('author', '-created', '-id'),
+                name='recipe_author_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def image_preview(self):
+        """Миниатюра изображения, а если её ещё нет — само изображение."""
+        return self.image_thumbnail or self.image
+
 
 class IngredientInRecipe(models.Model):
     """Промежуточная модель для ингредиентов в рецепте."""
@@ -310,3 +487,43 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в материализованной ленте подписчика."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    # Копия Recipe.created: лента читается по индексу без соединения.
+    created = models.DateTimeField(
+        verbose_name='Дата публикации рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created', '-recipe'),
+                name='feed_entry_user_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,185 @@
+import io
+import json
+from unittest import mock, skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from PIL import Image
+
+from .constants import IMAGE_MAX_DIMENSION, RECIPE_THUMBNAIL_SIZE
+from .images import process_image
+from .management.commands import import_data
+from .models import Ingredient, IngredientInRecipe, Recipe, Tag, User
+
+
+class ReadJsonRowsTest(SimpleTestCase):
+    """Потоковое чтение ингредиентов из JSON."""
+
+    rows = [
+        {'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+        for number in range(50)
+    ]
+
+    def read(self, text, chunk_size):
+        with mock.patch.object(import_data, 'READ_CHUNK_SIZE', chunk_size):
+            return list(import_data.read_json_rows(io.StringIO(text)))
+
+    def test_items_across_chunk_boundaries(self):
+        expected = [
+            (row['name'], row['measurement_unit']) for row in self.rows
+        ]
+        for indent in (None, 2):
+            text = json.dumps(self.rows, ensure_ascii=False, indent=indent)
+            for chunk_size in (1, 7, 64, len(text)):
+                with self.subTest(indent=indent, chunk_size=chunk_size):
+                    self.assertEqual(self.read(text, chunk_size), expected)
+
+    def test_empty_array(self):
+        self.assertEqual(self.read(' [ ] ', 2), [])
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            self.read('{"name": "соль"}', 64)
+        with self.assertRaises(json.JSONDecodeError):
+            self.read('[{"name": "соль", "measurement_unit"', 8)
+
+
+class ProcessImageTest(SimpleTestCase):
+    """Загруженное изображение поворачивается, уменьшается
+    и кодируется заново, рядом создаётся миниатюра."""
+
+    def upload(self):
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        # Ориентация 6: при показе кадр поворачивается на 90°.
+        exif[0x0112] = 6
+        Image.new('RGB', (4000, 3000), 'red').save(
+            buffer, 'JPEG', exif=exif
+        )
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue())
+
+    def test_process_image(self):
+        image, thumbnail = process_image(
+            self.upload(), RECIPE_THUMBNAIL_SIZE
+        )
+        with Image.open(image) as result:
+            self.assertEqual(
+                result.size,
+                (IMAGE_MAX_DIMENSION * 3 // 4, IMAGE_MAX_DIMENSION)
+            )
+            self.assertNotIn(0x0112, result.getexif())
+        with Image.open(thumbnail) as result:
+            self.assertEqual(result.size, RECIPE_THUMBNAIL_SIZE)
+        self.assertTrue(thumbnail.name.startswith('photo_thumb.'))
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'search_vector ведут триггеры PostgreSQL'
+)
+class DatabaseManagedFieldsTest(TestCase):
+    """save() не затирает поля, которые ведёт база."""
+
+    def test_save_keeps_counters_and_search_vector(self):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Блины', text='Описание', cooking_time=10
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=5)
+        recipe.name = 'Оладьи'
+        recipe.save()
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(recipe.favorites_count, 5)
+        self.assertIn("'олад'", recipe.search_vector)
+
+
+class RecipeQuerySetTest(TestCase):
+    """Связанные объекты рецептов грузятся на всю выборку сразу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        for number in range(5):
+            author = User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+                first_name='Имя', last_name='Фамилия'
+            )
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.add(tag)
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+
+    def test_with_related(self):
+        with self.assertNumQueries(3):
+            recipes = [
+                (
+                    recipe.author.username,
+                    [tag.slug for tag in recipe.tags.all()],
+                    [
+                        row.ingredient.name
+                        for row in recipe.recipe_ingredients.all()
+                    ],
+                )
+                for recipe in Recipe.objects.with_related()
+            ]
+        self.assertEqual(len(recipes), 5)
+        self.assertEqual(recipes[0][1:], (['breakfast'], ['мука']))
+
+
+class MergeDuplicateIngredientsTest(TransactionTestCase):
+    """Миграция 0002 сводит дубли, сохраняя количества в рецептах."""
+
+    before = [('recipes', '0001_initial')]
+    after = [('recipes', '0002_ingredient_unique')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_amounts_of_duplicates_are_summed(self):
+        apps = self.migrate(self.before)
+        ingredients = apps.get_model('recipes', 'Ingredient').objects
+        author = apps.get_model('recipes', 'User').objects.create(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия'
+        )
+        recipe = apps.get_model('recipes', 'Recipe').objects.create(
+            author=author, name='Блины', text='Описание', cooking_time=10
+        )
+        salt, salt_again = (
+            ingredients.create(name='соль', measurement_unit='г')
+            for _ in range(2)
+        )
+        rows = apps.get_model('recipes', 'IngredientInRecipe').objects
+        rows.create(recipe=recipe, ingredient=salt, amount=5)
+        rows.create(recipe=recipe, ingredient=salt_again, amount=7)
+
+        apps = self.migrate(self.after)
+        rows = apps.get_model('recipes', 'IngredientInRecipe').objects
+        self.assertEqual(
+            list(rows.values_list('ingredient_id', 'amount')),
+            [(salt.pk, 12)]
+        )
+        self.assertEqual(
+            apps.get_model('recipes', 'Ingredient').objects.count(), 1
+        )